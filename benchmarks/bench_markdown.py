@@ -0,0 +1,78 @@
+"""
+Compare markdownify with the native converter on exported post and comment HTML.
+
+Post and comment contents are taken from a synthetic WXR export (generated
+and reused like run_benchmarks.py) plus the parity corpus. Every document
+is converted by both converters; the outputs must be identical, then the
+best of --repeat timed runs is reported for each converter.
+
+    python benchmarks/bench_markdown.py --posts 2000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_wxr import generate  # noqa: E402
+from markdown_corpus import CASES, check  # noqa: E402
+from markdownify import markdownify  # noqa: E402
+from wpmigration import fast_markdownify, wpparse  # noqa: E402
+
+
+def load_htmls(posts, data_dir):
+    path = os.path.join(data_dir, "wxr-%d.xml" % posts)
+    if not os.path.exists(path):
+        generate(path, posts=posts)
+    result = wpparse(path)
+    htmls = list(CASES)
+    for items in result["items"].values():
+        for item in items:
+            if item["content"]:
+                htmls.append(item["content"])
+            htmls.extend(comment["content"] for comment in item.get("comments") or [] if comment["content"])
+    return htmls
+
+
+def best_time(converter, htmls, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in htmls:
+            converter(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "wxr-bench"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    htmls = load_htmls(args.posts, args.data_dir)
+    size = sum(len(html) for html in htmls)
+
+    mismatches = check(htmls)
+    print("%d documents (%.1f MiB of HTML), %d mismatches" % (len(htmls), size / 1048576, len(mismatches)))
+    if mismatches:
+        return 1
+
+    warnings.filterwarnings("ignore", module="bs4")
+    baseline = best_time(markdownify, htmls, args.repeat)
+    native = best_time(fast_markdownify, htmls, args.repeat)
+    print("%-20s %10s %14s" % ("converter", "time (s)", "docs/s"))
+    for name, elapsed in (("markdownify", baseline), ("fast_markdownify", native)):
+        print("%-20s %10.3f %14.0f" % (name, elapsed, len(htmls) / elapsed))
+    print("speedup: %.2fx" % (baseline / native))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Generate a synthetic WordPress WXR 1.2 export for benchmarking.
+
+The file contains posts, pages, nested comment threads, TablePress tables,
+attachments with serialized _wp_attachment_metadata, and posts embedding
+those attachments (original and resized URLs). Output is deterministic for
+a given seed.
+
+    python benchmarks/generate_wxr.py export.xml --posts 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape, quoteattr
+
+import phpserialize
+
+SITE_URL = "https://blog.example.com"
+UPLOADS_URL = SITE_URL + "/wp-content/uploads"
+SIZES = {"thumbnail": (150, 150), "medium": (300, 200), "large": (1024, 683)}
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua wordpress python markdown mix space"
+).split()
+
+
+def cdata(text):
+    if text is None:
+        return ""
+    return "<![CDATA[" + str(text).replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _date(rng, start=datetime(2015, 1, 1), days=3650):
+    return start + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def _fmt(date):
+    return date.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _write_header(f, categories, tags):
+    f.write('<?xml version="1.0" encoding="UTF-8" ?>\n')
+    f.write(
+        '<rss version="2.0"\n'
+        '\txmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"\n'
+        '\txmlns:content="http://purl.org/rss/1.0/modules/content/"\n'
+        '\txmlns:wfw="http://wellformedweb.org/CommentAPI/"\n'
+        '\txmlns:dc="http://purl.org/dc/elements/1.1/"\n'
+        '\txmlns:wp="http://wordpress.org/export/1.2/"\n'
+        '>\n<channel>\n'
+    )
+    f.write("\t<title>Synthetic Blog</title>\n")
+    f.write("\t<link>%s</link>\n" % SITE_URL)
+    f.write("\t<description>Generated for benchmarks</description>\n")
+    f.write("\t<pubDate>Mon, 07 Oct 2024 00:00:00 +0000</pubDate>\n")
+    f.write("\t<language>en-US</language>\n")
+    f.write("\t<wp:wxr_version>1.2</wp:wxr_version>\n")
+    f.write("\t<wp:base_site_url>%s</wp:base_site_url>\n" % SITE_URL)
+    f.write("\t<wp:base_blog_url>%s</wp:base_blog_url>\n" % SITE_URL)
+    f.write(
+        "\t<wp:author><wp:author_id>1</wp:author_id>"
+        "<wp:author_login>%s</wp:author_login><wp:author_email>%s</wp:author_email>"
+        "<wp:author_display_name>%s</wp:author_display_name>"
+        "<wp:author_first_name>%s</wp:author_first_name>"
+        "<wp:author_last_name>%s</wp:author_last_name></wp:author>\n"
+        % (cdata("admin"), cdata("admin@example.com"), cdata("Admin"), cdata(""), cdata(""))
+    )
+    for term_id, (slug, name) in enumerate(categories, start=1):
+        f.write(
+            "\t<wp:category><wp:term_id>%d</wp:term_id>"
+            "<wp:category_nicename>%s</wp:category_nicename>"
+            "<wp:category_parent>%s</wp:category_parent>"
+            "<wp:cat_name>%s</wp:cat_name></wp:category>\n"
+            % (term_id, cdata(slug), cdata(""), cdata(name))
+        )
+    for term_id, (slug, name) in enumerate(tags, start=len(categories) + 1):
+        f.write(
+            "\t<wp:tag><wp:term_id>%d</wp:term_id><wp:tag_slug>%s</wp:tag_slug>"
+            "<wp:tag_name>%s</wp:tag_name></wp:tag>\n"
+            % (term_id, cdata(slug), cdata(name))
+        )
+
+
+def _write_item(f, item):
+    f.write("\t<item>\n")
+    f.write("\t\t<title>%s</title>\n" % escape(item["title"]))
+    f.write("\t\t<link>%s</link>\n" % escape(item["link"]))
+    f.write("\t\t<pubDate>%s</pubDate>\n" % item["date"].strftime("%a, %d %b %Y %H:%M:%S +0000"))
+    f.write("\t\t<dc:creator>%s</dc:creator>\n" % cdata("admin"))
+    f.write('\t\t<guid isPermaLink="false">%s</guid>\n' % escape(item["guid"]))
+    f.write("\t\t<description></description>\n")
+    f.write("\t\t<content:encoded>%s</content:encoded>\n" % cdata(item["content"]))
+    f.write("\t\t<excerpt:encoded>%s</excerpt:encoded>\n" % cdata(item.get("excerpt", "")))
+    f.write("\t\t<wp:post_id>%d</wp:post_id>\n" % item["id"])
+    f.write("\t\t<wp:post_date>%s</wp:post_date>\n" % cdata(_fmt(item["date"])))
+    f.write("\t\t<wp:post_date_gmt>%s</wp:post_date_gmt>\n" % cdata(_fmt(item["date"])))
+    f.write("\t\t<wp:post_modified>%s</wp:post_modified>\n" % cdata(_fmt(item["modified"])))
+    f.write("\t\t<wp:post_modified_gmt>%s</wp:post_modified_gmt>\n" % cdata(_fmt(item["modified"])))
+    f.write("\t\t<wp:comment_status>%s</wp:comment_status>\n" % cdata(item.get("comment_status", "open")))
+    f.write("\t\t<wp:ping_status>%s</wp:ping_status>\n" % cdata("closed"))
+    f.write("\t\t<wp:post_name>%s</wp:post_name>\n" % cdata(item["slug"]))
+    f.write("\t\t<wp:status>%s</wp:status>\n" % cdata(item.get("status", "publish")))
+    f.write("\t\t<wp:post_parent>%d</wp:post_parent>\n" % item.get("parent", 0))
+    f.write("\t\t<wp:menu_order>0</wp:menu_order>\n")
+    f.write("\t\t<wp:post_type>%s</wp:post_type>\n" % cdata(item["type"]))
+    f.write("\t\t<wp:post_password>%s</wp:post_password>\n" % cdata(item.get("password", "")))
+    f.write("\t\t<wp:is_sticky>0</wp:is_sticky>\n")
+    if "attachment_url" in item:
+        f.write("\t\t<wp:attachment_url>%s</wp:attachment_url>\n" % cdata(item["attachment_url"]))
+    for domain, slug, name in item.get("terms", []):
+        f.write("\t\t<category domain=%s nicename=%s>%s</category>\n" % (quoteattr(domain), quoteattr(slug), cdata(name)))
+    for key, value in item.get("postmeta", []):
+        f.write(
+            "\t\t<wp:postmeta><wp:meta_key>%s</wp:meta_key><wp:meta_value>%s</wp:meta_value></wp:postmeta>\n"
+            % (cdata(key), cdata(value))
+        )
+    for comment in item.get("comments", []):
+        f.write(
+            "\t\t<wp:comment>"
+            "<wp:comment_id>%d</wp:comment_id>"
+            "<wp:comment_author>%s</wp:comment_author>"
+            "<wp:comment_author_email>%s</wp:comment_author_email>"
+            "<wp:comment_author_url>%s</wp:comment_author_url>"
+            "<wp:comment_author_IP>%s</wp:comment_author_IP>"
+            "<wp:comment_date>%s</wp:comment_date>"
+            "<wp:comment_date_gmt>%s</wp:comment_date_gmt>"
+            "<wp:comment_content>%s</wp:comment_content>"
+            "<wp:comment_approved>%s</wp:comment_approved>"
+            "<wp:comment_type>%s</wp:comment_type>"
+            "<wp:comment_parent>%d</wp:comment_parent>"
+            "<wp:comment_user_id>0</wp:comment_user_id>"
+            "</wp:comment>\n"
+            % (
+                comment["id"], cdata(comment["author"]), cdata(comment["email"]), escape(comment["url"]),
+                cdata(comment["ip"]), cdata(_fmt(comment["date"])), cdata(_fmt(comment["date"])),
+                cdata(comment["content"]), cdata(comment["approved"]), cdata("comment"), comment["parent"],
+            )
+        )
+    f.write("\t</item>\n")
+
+
+def _attachment(rng, post_id):
+    date = _date(rng)
+    year, month = date.strftime("%Y"), date.strftime("%m")
+    name = "image-%d" % post_id
+    width, height = rng.choice([(1920, 1280), (2560, 1707), (800, 600)])
+    file_name = "%s.jpg" % name
+    if width > 2048:
+        file_name = "%s-scaled.jpg" % name
+    sizes = {
+        size: {
+            "file": "%s-%dx%d.jpg" % (name, w, h),
+            "width": w,
+            "height": h,
+            "mime-type": "image/jpeg",
+        }
+        for size, (w, h) in SIZES.items()
+    }
+    metadata = {
+        "width": width,
+        "height": height,
+        "file": "%s/%s/%s" % (year, month, file_name),
+        "filesize": rng.randrange(50000, 5000000),
+        "sizes": sizes,
+        "image_meta": {"aperture": "0", "credit": "", "camera": "", "caption": "", "title": ""},
+    }
+    if file_name.endswith("-scaled.jpg"):
+        metadata["original_image"] = "%s.jpg" % name
+    url = "%s/%s/%s/%s" % (UPLOADS_URL, year, month, file_name)
+    return {
+        "id": post_id,
+        "type": "attachment",
+        "title": name,
+        "slug": name,
+        "link": "%s/%s/" % (SITE_URL, name),
+        "guid": url,
+        "attachment_url": url,
+        "content": "",
+        "date": date,
+        "modified": date,
+        "status": "inherit",
+        "postmeta": [
+            ("_wp_attached_file", metadata["file"]),
+            ("_wp_attachment_metadata", phpserialize.dumps(metadata).decode()),
+        ],
+        "urls": [url] + ["%s/%s/%s/%s" % (UPLOADS_URL, year, month, size["file"]) for size in sizes.values()],
+    }
+
+
+def _comments(rng, next_id, count, start_date):
+    comments = []
+    for _ in range(count):
+        parent = 0
+        if comments and rng.random() < 0.5:
+            parent = rng.choice(comments)["id"]
+        comments.append({
+            "id": next_id,
+            "author": rng.choice(["Alice", "Bob", "Carol", "Dave"]),
+            "email": "user%d@example.com" % rng.randrange(1000),
+            "url": rng.choice(["", "https://example.org"]),
+            "ip": "10.0.%d.%d" % (rng.randrange(256), rng.randrange(256)),
+            "date": start_date + timedelta(minutes=rng.randrange(100000)),
+            "content": "<p>%s</p>" % _sentence(rng, rng.randrange(5, 30)),
+            "approved": "trash" if rng.random() < 0.02 else "1",
+            "parent": parent,
+        })
+        next_id += 1
+    # WordPress does not guarantee that parents precede replies
+    rng.shuffle(comments)
+    return comments
+
+
+def _body(rng, attachments, tables):
+    blocks = []
+    for _ in range(rng.randrange(3, 10)):
+        kind = rng.random()
+        if kind < 0.5:
+            blocks.append("<!-- wp:paragraph -->\n<p>%s <a href=\"https://example.org\">%s</a> <strong>%s</strong></p>\n<!-- /wp:paragraph -->" % (
+                _sentence(rng, 30), rng.choice(WORDS), rng.choice(WORDS)))
+        elif kind < 0.6:
+            blocks.append("<h2>%s</h2>" % _sentence(rng, 4))
+        elif kind < 0.7:
+            blocks.append("<ul>%s</ul>" % "".join("<li>%s</li>" % _sentence(rng, 5) for _ in range(rng.randrange(2, 6))))
+        elif kind < 0.8:
+            blocks.append("<pre><code>print(%r)</code></pre>" % _sentence(rng, 3))
+        elif kind < 0.95 and attachments:
+            url = rng.choice(rng.choice(attachments)["urls"])
+            blocks.append('<figure class="wp-block-image"><img src="%s" alt="%s" /></figure>' % (url, rng.choice(WORDS)))
+        elif tables:
+            blocks.append("[table id=%d /]" % rng.randrange(1, tables + 1))
+    return "\n\n".join(blocks)
+
+
+def generate(path, posts=1000, pages=None, attachments=None, tables=None, comments_per_post=3, seed=0):
+    """
+    Write a synthetic export with the given number of posts to path.
+    Pages, attachments and tables default to a fraction of the post count.
+    """
+    rng = random.Random(seed)
+    pages = max(1, posts // 20) if pages is None else pages
+    attachments = max(1, posts // 2) if attachments is None else attachments
+    tables = max(1, posts // 100) if tables is None else tables
+
+    categories = [("category-%d" % i, "Category %d" % i) for i in range(max(2, posts // 200))]
+    tags = [("tag-%d" % i, "Tag %d" % i) for i in range(max(5, posts // 50))]
+    next_id = 1
+    next_comment_id = 1
+    counts = {"post": 0, "page": 0, "attachment": 0, "tablepress_table": 0, "comment": 0}
+
+    with open(path, "w", encoding="utf-8") as f:
+        _write_header(f, categories, tags)
+
+        attachment_items = []
+        for _ in range(attachments):
+            attachment = _attachment(rng, next_id)
+            next_id += 1
+            attachment_items.append(attachment)
+            _write_item(f, attachment)
+        counts["attachment"] = attachments
+
+        for table_id in range(1, tables + 1):
+            rows = [["Head %d" % i for i in range(4)]] + [
+                [rng.choice(WORDS) for _ in range(4)] for _ in range(rng.randrange(2, 20))
+            ]
+            date = _date(rng)
+            _write_item(f, {
+                "id": next_id, "type": "tablepress_table", "title": "Table %d" % table_id,
+                "slug": "table-%d" % table_id, "link": "%s/?p=%d" % (SITE_URL, next_id),
+                "guid": "%s/?post_type=tablepress_table&p=%d" % (SITE_URL, next_id),
+                "content": json.dumps(rows),
+                "date": date, "modified": date, "comment_status": "closed",
+                "postmeta": [("_tablepress_export_table_id", str(table_id))],
+            })
+            next_id += 1
+        counts["tablepress_table"] = tables
+
+        for index in range(posts + pages):
+            _type = "post" if index < posts else "page"
+            date = _date(rng)
+            comment_count = rng.randrange(0, comments_per_post * 2 + 1)
+            comments = _comments(rng, next_comment_id, comment_count, date)
+            next_comment_id += comment_count
+            item = {
+                "id": next_id, "type": _type, "title": _sentence(rng, 5)[:-1],
+                "slug": "%s-%d" % (_type, next_id),
+                "link": "%s/%s-%d/" % (SITE_URL, _type, next_id),
+                "guid": "%s/?p=%d" % (SITE_URL, next_id),
+                "content": _body(rng, attachment_items, tables),
+                "excerpt": _sentence(rng, 10) if rng.random() < 0.3 else "",
+                "date": date, "modified": date + timedelta(days=rng.randrange(30)),
+                "comments": comments,
+                "postmeta": [("views", str(rng.randrange(10000))), ("love", str(rng.randrange(100)))],
+            }
+            if _type == "post":
+                category = rng.choice(categories)
+                item["terms"] = [("category", category[0], category[1])] + [
+                    ("post_tag", tag[0], tag[1]) for tag in rng.sample(tags, rng.randrange(0, 4))
+                ]
+                if rng.random() < 0.1:
+                    item["terms"].append(("post_format", "post-format-status", "Status"))
+                if rng.random() < 0.02:
+                    item["password"] = "secret"
+            _write_item(f, item)
+            next_id += 1
+            counts[_type] += 1
+            counts["comment"] += comment_count
+
+        f.write("</channel>\n</rss>\n")
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=None)
+    parser.add_argument("--attachments", type=int, default=None)
+    parser.add_argument("--tables", type=int, default=None)
+    parser.add_argument("--comments-per-post", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = generate(
+        args.path, args.posts, args.pages, args.attachments, args.tables,
+        args.comments_per_post, args.seed,
+    )
+    print("Wrote %s (%.1f MiB): %s" % (
+        args.path, os.path.getsize(args.path) / 1048576,
+        ", ".join("%d %s" % (count, name) for name, count in counts.items()),
+    ))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Parity corpus for wpmigration.wpmarkdown.fast_markdownify.
+
+CASES are hand-written snippets covering the WordPress markup the native
+converter handles (Gutenberg blocks, classic-editor HTML, comments) and the
+bs4 / markdownify quirks it has to reproduce. generate() adds seeded random
+documents built from the same vocabulary, including malformed nesting,
+stray end tags, entities and whitespace-only text.
+
+    python benchmarks/markdown_corpus.py --random 20000 --seed 1
+"""
+import argparse
+import os
+import random
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdownify import markdownify  # noqa: E402
+from wpmigration.wpmarkdown import fast_markdownify  # noqa: E402
+
+CASES = [
+    # Gutenberg blocks
+    '<!-- wp:paragraph -->\n<p>Hello <strong>world</strong>, see <a href="https://example.com/a_b">the docs</a>.</p>\n<!-- /wp:paragraph -->',
+    '<!-- wp:heading -->\n<h2 class="wp-block-heading">Section 1. Setup</h2>\n<!-- /wp:heading -->',
+    '<!-- wp:heading {"level":3} -->\n<h3 class="wp-block-heading" id="x">Step #2: *install*</h3>\n<!-- /wp:heading -->',
+    '<!-- wp:image {"id":12} -->\n<figure class="wp-block-image size-large"><img src="https://blog.example.com/wp-content/uploads/2024/01/a-1024x768.png" alt="" class="wp-image-12"/><figcaption class="wp-element-caption">A caption</figcaption></figure>\n<!-- /wp:image -->',
+    '<!-- wp:list -->\n<ul><!-- wp:list-item -->\n<li>one</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>two <em>2</em></li>\n<!-- /wp:list-item --></ul>\n<!-- /wp:list -->',
+    '<!-- wp:list {"ordered":true,"start":4} -->\n<ol start="4"><li>four</li><li>five<ul><li>nested</li></ul></li></ol>\n<!-- /wp:list -->',
+    '<!-- wp:code -->\n<pre class="wp-block-code"><code>def f(x):\n    return x * 2  # &lt;done&gt;\n</code></pre>\n<!-- /wp:code -->',
+    '<!-- wp:quote -->\n<blockquote class="wp-block-quote"><p>Quote line one</p><p>line two</p><cite>Someone</cite></blockquote>\n<!-- /wp:quote -->',
+    '<!-- wp:separator -->\n<hr class="wp-block-separator has-alpha-channel-opacity"/>\n<!-- /wp:separator -->',
+    '<!-- wp:preformatted -->\n<pre class="wp-block-preformatted">  keep   spacing\n\tand tabs</pre>\n<!-- /wp:preformatted -->',
+    '<!-- wp:shortcode -->\n[table id=3 /]\n<!-- /wp:shortcode -->',
+    # classic editor
+    'First line<br />\nsecond line<br>\nthird<br/>fourth\n\nNew paragraph with &nbsp; and &amp; and &copy; 2024.',
+    '<p style="text-align: center;"><span style="color: #ff0000;">red_text</span></p>\n<p>&#8220;quoted&#8221; &#150; dash &#x2014; &#0;</p>',
+    '<div class="wp-caption aligncenter"><a href="https://example.com/big.jpg"><img class="size-medium" src="https://example.com/small.jpg" alt="Alt text" width="300" height="200" title="A &quot;title&quot;" /></a><p class="wp-caption-text">Caption</p></div>',
+    '<h1>Title</h1>\n<h2></h2>\n<h4> spaced  heading </h4><h5><a href="#a">anchor</a><br>break</h5>',
+    '<p><a href="https://example.com">https://example.com</a> <a href="mailto:a@b.c" title="Mail">mail</a> <a>no href</a> <a href="">empty</a></p>',
+    '<p><b> bold </b><i>it</i><del>gone</del><s>strike</s><sub>2</sub><sup>3</sup><kbd>Ctrl</kbd><samp>out</samp></p>',
+    '<pre><code class="language-js">const a = `x`;\n<b>not bold</b> <em>kept</em></code></pre>',
+    '<code><strong>x</strong> y</code> <kbd><em>z</em></kbd>',
+    '<ul>\n  <li>\n    <p>para in li</p>\n  </li>\n  <li>text   <!-- c -->  </li>\n</ul>\n<p>after</p>',
+    '<ol><li>a</li><!-- x --> <li>b</li>\n<li>c</li></ol><ol start="x"><li>d</li></ol><ol start="0"><li>e</li></ol>',
+    '<li>orphan item</li><ul><li>1</li></ul><ul><li>2</li></ul>text',
+    '<blockquote>\n  <blockquote>nested <br> quote</blockquote>\n</blockquote>',
+    # bs4 / html.parser quirks
+    '<br>a<br/>b<br></br>c<img src="x.png"></img>d',
+    '<p>unclosed <b>bold <i>both</p> tail</b> text</i>',
+    '</div></p>stray end tags<p>x',
+    '<p>a<p>b</p>',
+    '&amp &lt; &unknown; &#x41; &#65 &#129; &#xD800; &#1114112;',
+    '<!----><p>x</p><!-- -->',
+    '<textarea>  a  b  </textarea><pre>\n\n</pre><pre></pre>',
+    '1. not a list\n- not a bullet\n# not a heading\n> not a quote\n| pipe | 3) paren',
+    '<p> </p><ul> <li>nbsp</li> </ul>',
+    '<h7>bad heading</h7><h1x>odd</h1x>',
+    '<unknown-tag attr>kept</unknown-tag><span>*star* _under_ `tick` [link] ~tilde~ =eq= +plus+</span>',
+    # falls back to markdownify
+    '<table><thead><tr><th>a</th><th>b</th></tr></thead><tbody><tr><td>1</td><td>2</td></tr></tbody></table>',
+    '<p>before</p><script>var a = "<b>x</b>";</script><style>p { color: red }</style><p>after</p>',
+    '<!DOCTYPE html><html><body><p>doc</p></body></html>',
+    '<![CDATA[ raw ]]><p>x</p>',
+    '',
+    'plain text only',
+]
+
+INLINE_TAGS = ["strong", "b", "em", "i", "del", "s", "code", "kbd", "sub", "sup", "span", "a", "samp"]
+BLOCK_TAGS = ["p", "div", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "figure", "figcaption"]
+VOID_TAGS = ["br", "br/", "img", "hr"]
+TEXTS = [
+    "word", "two words", "  spaced   out  ", "\n", " ", "\t", "\n\n  \n", "under_score", "a*b", "1. item", "2) x",
+    "#tag", "a\\b", "x < y", "&amp;", "&nbsp;", "&#8217;", "&#150;", "&lt;b&gt;", "&bogus", "[x]", "`c`", "~t~",
+    "https://example.com/a_b", "末尾", "=+|-", " ",
+]
+ATTRS = {
+    "a": ['href="https://example.com/a_b"', 'href="https://example.com/a_b" title="T \'q\' &quot;x&quot;"', "", 'href=""'],
+    "img": ['src="https://example.com/p.png" alt="pic"', 'src="x.jpg"', 'alt="only alt" title="t"', ""],
+    "ol": ['start="3"', 'start="abc"', ""],
+}
+
+
+def _tag(rng, name):
+    attrs = ATTRS.get(name.rstrip("/"))
+    attr = " " + rng.choice(attrs) if attrs and rng.random() < 0.8 else ""
+    if name.endswith("/"):
+        return "<%s%s/>" % (name[:-1], attr)
+    return "<%s%s>" % (name, attr)
+
+
+def _fragment(rng, depth):
+    parts = []
+    for _ in range(rng.randint(1, 5)):
+        roll = rng.random()
+        if depth <= 0 or roll < 0.3:
+            parts.append(rng.choice(TEXTS))
+        elif roll < 0.4:
+            parts.append(_tag(rng, rng.choice(VOID_TAGS)))
+        elif roll < 0.45:
+            parts.append(rng.choice(["<!-- wp:paragraph -->", "<!-- -->", "</p>", "</li>", "</b>", "</br>", "</img>"]))
+        else:
+            name = rng.choice(BLOCK_TAGS if roll < 0.7 else INLINE_TAGS)
+            if name in ("ul", "ol"):
+                inner = "".join(
+                    rng.choice(["", "\n", " "]) + "<li>" + _fragment(rng, depth - 1) + ("</li>" if rng.random() < 0.9 else "")
+                    for _ in range(rng.randint(1, 4))
+                )
+            else:
+                inner = _fragment(rng, depth - 1)
+            end = "</%s>" % name if rng.random() < 0.92 else ""
+            parts.append(_tag(rng, name) + inner + end)
+    return "".join(parts)
+
+
+def generate(count, seed=0):
+    """
+    Yield count seeded random documents.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "\n".join(_fragment(rng, rng.randint(1, 5)) for _ in range(rng.randint(1, 6)))
+
+
+def check(htmls):
+    """
+    Return [(html, expected, actual)] for every document where the outputs differ.
+    """
+    mismatches = []
+    # markdownify warns about short documents that look like file names or URLs
+    warnings.filterwarnings("ignore", module="bs4")
+    for html in htmls:
+        expected = markdownify(html)
+        actual = fast_markdownify(html)
+        if actual != expected:
+            mismatches.append((html, expected, actual))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--random", type=int, default=5000, help="number of generated documents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--show", type=int, default=5, help="mismatches to print")
+    args = parser.parse_args(argv)
+
+    documents = CASES + list(generate(args.random, args.seed))
+    mismatches = check(documents)
+    for html, expected, actual in mismatches[:args.show]:
+        print("HTML:     %r\nexpected: %r\nactual:   %r\n" % (html, expected, actual))
+    print("%d documents, %d mismatches" % (len(documents), len(mismatches)))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Scaling benchmark for wpparse and convert_to_bson on synthetic exports.
+
+For every size, a WXR file with that many posts is generated (and reused on
+later runs), then wpparse and convert_to_bson are run under StageProfiler.
+Wall time, CPU time and tracemalloc peak are recorded per stage.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --output bench.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_wxr import generate, UPLOADS_URL  # noqa: E402
+from wpmigration import StageProfiler, convert_to_bson, wpparse  # noqa: E402
+
+
+def migrate_pic_func(pic_url):
+    if pic_url.startswith(UPLOADS_URL + "/"):
+        year, month, file_name = pic_url.split("/")[-3:]
+        return "https://space.example.com/api/v2/objects/file/%s_%s_%s" % (year, month, file_name)
+    return pic_url
+
+
+def migrate_to_notes_func(post_data):
+    return post_data["password"] is not None or (
+        post_data["custom_fields"].get("post_format") == "post-format-status"
+    )
+
+
+def run(size, data_dir, workers=1, trace_memory=True, stream=False, spill=False):
+    path = os.path.join(data_dir, "wxr-%d.xml" % size)
+    if not os.path.exists(path):
+        generate(path, posts=size)
+
+    parse_profiler = StageProfiler(trace_memory=trace_memory)
+    with parse_profiler:
+        with parse_profiler.stage("wpparse") as stage:
+            result = wpparse(path, stream=stream)
+            stage["items"] = sum(len(items) for items in result["items"].values())
+    del result
+
+    convert_profiler = StageProfiler(trace_memory=trace_memory)
+    with tempfile.TemporaryDirectory() as output_dir:
+        convert_to_bson(
+            path, output_dir, migrate_pic_func, migrate_to_notes_func,
+            stream=stream, workers=workers, profiler=convert_profiler,
+            spill_path=os.path.join(output_dir, "spill.db") if spill else None,
+        )
+
+    return {
+        "size": size,
+        "file_size": os.path.getsize(path),
+        "wpparse": parse_profiler.report(),
+        "convert_to_bson": convert_profiler.report(),
+    }
+
+
+def _print_report(report):
+    print("\n== %d posts (%.1f MiB export) ==" % (report["size"], report["file_size"] / 1048576))
+    print("%-48s %10s %10s %12s %10s" % ("stage", "wall (s)", "cpu (s)", "peak (MiB)", "items"))
+    for name in ("wpparse", "convert_to_bson"):
+        for stage in report[name]["stages"]:
+            peak = stage["peak_memory"]
+            print("%-48s %10.3f %10.3f %12s %10s" % (
+                "%s/%s" % (name, stage["name"]) if name == "convert_to_bson" else stage["name"],
+                stage["wall_time"], stage["cpu_time"],
+                "-" if peak is None else "%.1f" % (peak / 1048576),
+                "-" if stage["items"] is None else stage["items"],
+            ))
+    print("%-48s %10.3f" % ("convert_to_bson total", report["convert_to_bson"]["total_wall_time"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "wxr-bench"))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--stream", action="store_true", help="use the streaming parser")
+    parser.add_argument("--spill", action="store_true", help="keep intermediate data in an SQLite spill store")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, which slows every stage down")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    reports = []
+    for size in args.sizes:
+        report = run(size, args.data_dir, args.workers, not args.no_memory, args.stream, args.spill)
+        _print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
-from wpmigration import convert_to_bson, convert_keys_and_values, move_files_and_rename
-import json
+from wpmigration import convert_to_bson, move_files_and_rename, sync_files_and_rename, find_duplicate_files, mongo_saver, delta_saver, apply_delta_to_mongo, find_missing_images, fetch_images, failed_image_links, remote_file_name, write_backup_archive, verify_bson, find_unmatched_links, StageProfiler
+import logging
 
 def migrate_pic_func(pic_url):
     """
     用于替换图片链接，这里采用的文件命名规则是 year_month_filename
     """
     new_pic_url = pic_url
-    if pic_url.startswith("https://blog.fosky.top/wp-content/uploads/"):
+    canonical = media["canonical"].get(pic_url) if media else None
+    if canonical and canonical.count("/") == 2:
+        # 附件索引已换成原图链接，直接使用复制文件时的命名规则，不再按文件名猜测缩略图
+        year, month, file_name = canonical.split("/")
+        new_pic_url = f"https://space.fosky.top/api/v2/objects/file/{rename_pic_file_func(year, month, file_name)}"
+    elif pic_url.startswith("https://blog.fosky.top/wp-content/uploads/"):
         path = pic_url.split("/")
         year, month, file_name = path[-3], path[-2], path[-1]
         if "-" in file_name:
@@ -17,9 +22,20 @@ def migrate_pic_func(pic_url):
 
         pic_file_name = f"{year}_{month}_{file_name}"
         new_pic_url = f"https://space.fosky.top/api/v2/objects/file/{pic_file_name}"
+    elif FETCH_MISSING_IMAGES and pic_url.startswith(("http://", "https://", "//")):
+        # 外部图片下载到本地后使用自己的文件链接
+        new_pic_url = f"https://space.fosky.top/api/v2/objects/file/{remote_file_name(pic_url)}"
 
     return new_pic_url
 
+def migrate_fetched_pic_func(pic_url):
+    """
+    开启 FETCH_MISSING_IMAGES 时正式转换使用：下载失败的图片保留原链接，其余同 migrate_pic_func
+    """
+    if pic_url in failed_images:
+        return pic_url
+    return migrate_pic_func(pic_url)
+
 def migrate_to_notes_func(post_data):
     """
     用于将有密码 / 状态文章迁移为手记。
@@ -38,20 +54,71 @@ def rename_pic_file_func(year, month, file_name):
     return f"{year}_{month}_{file_name}"
 
 MIGRATE_DRAFT_POSTS = False # 迁移草稿和回收站文章，一般情况下不需要。未测试迁移该项目后的数据有效性。
+STREAM_PARSE = False # 使用流式解析导出文件，只省去 XML 树本身的内存，解析出的全部条目仍保留在内存中；要让内存占用与导出大小无关请使用 SPILL_PATH。
+SPILL_PATH = None # 导出文件大于可用内存时设为 SQLite 文件路径（如 "spill.db"），中间数据写入磁盘，内存占用与导出大小无关。
+CONVERT_WORKERS = 1 # HTML 转 Markdown 的并行进程数，设为 None 使用全部 CPU 核心。
+PARSE_WORKERS = None # 导出被拆分为多个文件时并行解析的进程数，None 表示每个文件一个进程，设为 1 则依次解析。
+CONVERT_CACHE_PATH = "markdown_cache.db" # Markdown 转换结果缓存，重复运行时跳过未变化的内容。设为 None 关闭缓存。
+FILE_TRANSFER_MODE = "copy" # 图片文件传输方式：copy / hardlink / reflink，后两者要求 uploads 与 files 在同一文件系统。
+PROFILE_REPORT_PATH = None # 设为文件路径（如 "profile.json"）时输出各阶段耗时与内存报告。
+MONGO_URI = None # 设为 Mix Space 的 MongoDB 连接串（如 "mongodb://localhost:27017"）则直接写入数据库，不再生成 bson 文件。
+MONGO_DATABASE = "mx-space"
+ONLY_REFERENCED_FILES = False # 只复制文章、页面与手记中实际引用到的图片（根据附件索引判断），并提前报告失效的图片链接。
+DEDUPLICATE_FILES = False # 内容相同的图片只保留一份，文章中的链接统一指向保留的文件。
+STABLE_IDS = False # 由 WordPress 的 id 生成固定的 _id，多次运行的结果可以直接比较。
+DELTA_STATE_PATH = None # 设为文件路径（如 "delta_state.json"）时只输出与上次运行相比新增、变化或删除的文档（写入 output_delta 或 MONGO_URI），并自动开启 STABLE_IDS。
+FETCH_MISSING_IMAGES = False # 下载 uploads 中缺失的图片与外部图片（放在 remote_files，可中断后继续），与 uploads 中的图片一起放入 files。
+INCREMENTAL_FILE_SYNC = True # 增量同步图片文件，只复制新增或变化的文件。设为 False 则每次清空 files 后重新复制。
+BACKUP_ARCHIVE_PATH = None # 设为 Mix Space 后台导出的备份压缩包路径时，直接生成替换了 bson 与图片的新压缩包 BACKUP_OUTPUT_PATH，无需手动修改压缩包。
+BACKUP_OUTPUT_PATH = "backup_migrated.zip"
+VERIFY_OUTPUT = True # 转换后校验 output 中的 bson 文件（字段类型、引用关系与唯一性），写入 MongoDB 或增量导出时不校验。
+
+media = None # convert_to_bson 的附件索引与图片记录，在下方设置，migrate_pic_func 用它得到原图的文件名
+failed_images = set() # 下载失败的图片链接，在下方设置
 
 if __name__ == "__main__":
-    # 请将 file_path 替换为你的 WordPress 导出文件路径
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    # 请将 file_path 替换为你的 WordPress 导出文件路径，导出被拆分为多个文件时可以使用路径列表，会按 PARSE_WORKERS 并行解析后合并
     file_path = "foskym039sblog.WordPress.2024-10-07.xml"
+    # WordPress 的 uploads 文件夹与重命名后图片的存放位置
+    wp_pic_dir_path = "uploads"
+    target_pic_dir_path = "files"
 
-    result = convert_to_bson(file_path, "output", migrate_pic_func, migrate_to_notes_func, MIGRATE_DRAFT_POSTS)
+    save_func = mongo_saver(MONGO_URI, MONGO_DATABASE, upsert=True) if MONGO_URI else None
+    if DELTA_STATE_PATH:
+        apply_func = (lambda delta: apply_delta_to_mongo(delta, MONGO_URI, MONGO_DATABASE)) if MONGO_URI else None
+        save_func = delta_saver(DELTA_STATE_PATH, "output_delta", apply_func)
+    profiler = StageProfiler(PROFILE_REPORT_PATH) if PROFILE_REPORT_PATH else None
+    media = {} if ONLY_REFERENCED_FILES or DEDUPLICATE_FILES or FETCH_MISSING_IMAGES else None
+    if DEDUPLICATE_FILES:
+        media["dedup"] = find_duplicate_files(wp_pic_dir_path)
+    options = dict(stream=STREAM_PARSE, parse_workers=PARSE_WORKERS, workers=CONVERT_WORKERS, cache_path=CONVERT_CACHE_PATH, media=media, stable_ids=STABLE_IDS or bool(DELTA_STATE_PATH), spill_path=SPILL_PATH)
+    extra_files = None
+    if FETCH_MISSING_IMAGES:
+        # 先转换一次（不保存结果）收集需要下载的图片，下载完成后再正式转换，只有下载成功的图片才换成自己的文件链接
+        convert_to_bson(file_path, "output", migrate_pic_func, migrate_to_notes_func, MIGRATE_DRAFT_POSTS, save_func=lambda migrations: None, **options)
+        downloads = find_missing_images(media["images"], wp_pic_dir_path, rename_pic_file_func)
+        fetched = fetch_images(downloads, "remote_files")
+        extra_files = fetched["files"]
+        failed_images = failed_image_links(media["images"], fetched["failed"])
+    result = convert_to_bson(file_path, "output", migrate_fetched_pic_func, migrate_to_notes_func, MIGRATE_DRAFT_POSTS, save_func=save_func, profiler=profiler, **options)
 
-    # 如果你不需要检查数据，可以把后面的注释了
-    result = convert_keys_and_values(result)
-    with open("output.json", "w") as f:
-        f.write(json.dumps(result, indent=4))
+    # 逐个读取 output 中的 bson 文件，检查字段、引用关系与唯一性，只输出有问题的文档；也可以单独运行 python verify.py output
+    # 需要查看完整数据时可以用 save_migrations_to_json(result, "output_json", split=True, sample=100) 按集合分文件并只输出前 100 条
+    if VERIFY_OUTPUT and save_func is None:
+        verify_bson("output")
 
     # 扫描 uploads 文件夹，将图片文件名转换为 year_month_filename
-    wp_pic_dir_path = "uploads"
-    target_pic_dir_path = "files"
+    only_files = media["referenced"] if ONLY_REFERENCED_FILES else None
+    duplicates = media["dedup"]["duplicates"] if DEDUPLICATE_FILES else None
+    if INCREMENTAL_FILE_SYNC:
+        sync_files_and_rename(wp_pic_dir_path, target_pic_dir_path, rename_pic_file_func, mode=FILE_TRANSFER_MODE, only_files=only_files, duplicates=duplicates, extra_files=extra_files)
+    else:
+        move_files_and_rename(wp_pic_dir_path, target_pic_dir_path, rename_pic_file_func, mode=FILE_TRANSFER_MODE, only_files=only_files, duplicates=duplicates, extra_files=extra_files)
+    if media is not None:
+        # 检查替换后的图片链接都有对应的文件
+        find_unmatched_links(media["images"], target_pic_dir_path)
 
-    move_files_and_rename(wp_pic_dir_path, target_pic_dir_path, rename_pic_file_func)
\ No newline at end of file
+    if BACKUP_ARCHIVE_PATH:
+        write_backup_archive(BACKUP_ARCHIVE_PATH, BACKUP_OUTPUT_PATH, result, target_pic_dir_path)
@@ -0,0 +1,120 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EXPORT_TEMPLATE = """<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0"
+	xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"
+	xmlns:content="http://purl.org/rss/1.0/modules/content/"
+	xmlns:wfw="http://wellformedweb.org/CommentAPI/"
+	xmlns:dc="http://purl.org/dc/elements/1.1/"
+	xmlns:wp="http://wordpress.org/export/1.2/"
+>
+<channel>
+	<title>Test Blog</title>
+	<link>https://blog.example.com</link>
+	<description>Just a test</description>
+	<pubDate>Mon, 07 Oct 2024 00:00:00 +0000</pubDate>
+	<language>en-US</language>
+	<wp:wxr_version>1.2</wp:wxr_version>
+	<wp:base_site_url>https://blog.example.com</wp:base_site_url>
+	<wp:base_blog_url>https://blog.example.com</wp:base_blog_url>
+	<wp:author><wp:author_id>1</wp:author_id><wp:author_login><![CDATA[admin]]></wp:author_login><wp:author_email><![CDATA[admin@example.com]]></wp:author_email><wp:author_display_name><![CDATA[Admin]]></wp:author_display_name><wp:author_first_name><![CDATA[]]></wp:author_first_name><wp:author_last_name><![CDATA[]]></wp:author_last_name></wp:author>
+	<wp:category><wp:term_id>1</wp:term_id><wp:category_nicename><![CDATA[tech]]></wp:category_nicename><wp:category_parent><![CDATA[]]></wp:category_parent><wp:cat_name><![CDATA[Tech]]></wp:cat_name></wp:category>
+	<item>
+		<title>Hello</title>
+		<link>https://blog.example.com/hello</link>
+		<dc:creator><![CDATA[admin]]></dc:creator>
+		<guid isPermaLink="false">https://blog.example.com/?p=10</guid>
+		<description></description>
+		<content:encoded><![CDATA[<p>Hello <b>world</b></p>]]></content:encoded>
+		<excerpt:encoded><![CDATA[]]></excerpt:encoded>
+		<wp:post_id>10</wp:post_id>
+		<wp:post_date><![CDATA[{post_date}]]></wp:post_date>
+		<wp:post_date_gmt><![CDATA[{post_date}]]></wp:post_date_gmt>
+		<wp:post_modified><![CDATA[2024-10-02 10:00:00]]></wp:post_modified>
+		<wp:post_modified_gmt><![CDATA[2024-10-02 02:00:00]]></wp:post_modified_gmt>
+		<wp:comment_status><![CDATA[open]]></wp:comment_status>
+		<wp:ping_status><![CDATA[open]]></wp:ping_status>
+		<wp:post_name><![CDATA[hello]]></wp:post_name>
+		<wp:status><![CDATA[publish]]></wp:status>
+		<wp:post_parent>0</wp:post_parent>
+		<wp:menu_order>0</wp:menu_order>
+		<wp:post_type><![CDATA[post]]></wp:post_type>
+		<wp:post_password><![CDATA[]]></wp:post_password>
+		<wp:is_sticky>0</wp:is_sticky>
+		<category domain="category" nicename="tech"><![CDATA[Tech]]></category>
+		<wp:comment><wp:comment_id>100</wp:comment_id><wp:comment_author><![CDATA[Amy]]></wp:comment_author><wp:comment_author_email><![CDATA[amy@example.com]]></wp:comment_author_email><wp:comment_author_url></wp:comment_author_url><wp:comment_author_IP><![CDATA[127.0.0.1]]></wp:comment_author_IP><wp:comment_date><![CDATA[2024-10-02 10:00:00]]></wp:comment_date><wp:comment_date_gmt><![CDATA[2024-10-02 02:00:00]]></wp:comment_date_gmt><wp:comment_content><![CDATA[<p>Nice <em>post</em></p>]]></wp:comment_content><wp:comment_approved><![CDATA[1]]></wp:comment_approved><wp:comment_type><![CDATA[comment]]></wp:comment_type><wp:comment_parent>0</wp:comment_parent><wp:comment_user_id>0</wp:comment_user_id></wp:comment>
+		<wp:comment><wp:comment_id>101</wp:comment_id><wp:comment_author><![CDATA[Admin]]></wp:comment_author><wp:comment_author_email><![CDATA[admin@example.com]]></wp:comment_author_email><wp:comment_author_url></wp:comment_author_url><wp:comment_author_IP><![CDATA[127.0.0.1]]></wp:comment_author_IP><wp:comment_date><![CDATA[2024-10-02 12:00:00]]></wp:comment_date><wp:comment_date_gmt><![CDATA[2024-10-02 04:00:00]]></wp:comment_date_gmt><wp:comment_content><![CDATA[Thanks]]></wp:comment_content><wp:comment_approved><![CDATA[1]]></wp:comment_approved><wp:comment_type><![CDATA[comment]]></wp:comment_type><wp:comment_parent>100</wp:comment_parent><wp:comment_user_id>1</wp:comment_user_id></wp:comment>
+		<wp:comment><wp:comment_id>102</wp:comment_id><wp:comment_author><![CDATA[Other Blog]]></wp:comment_author><wp:comment_author_email></wp:comment_author_email><wp:comment_author_url>https://other.example.com/post</wp:comment_author_url><wp:comment_author_IP><![CDATA[127.0.0.2]]></wp:comment_author_IP><wp:comment_date><![CDATA[2024-10-03 10:00:00]]></wp:comment_date><wp:comment_date_gmt><![CDATA[2024-10-03 02:00:00]]></wp:comment_date_gmt><wp:comment_content><![CDATA[Linked from Other Blog]]></wp:comment_content><wp:comment_approved><![CDATA[1]]></wp:comment_approved><wp:comment_type><![CDATA[pingback]]></wp:comment_type><wp:comment_parent>0</wp:comment_parent><wp:comment_user_id>0</wp:comment_user_id></wp:comment>
+	</item>
+	<item>
+		<title>Status</title>
+		<link>https://blog.example.com/status</link>
+		<dc:creator><![CDATA[admin]]></dc:creator>
+		<guid isPermaLink="false">https://blog.example.com/?p=11</guid>
+		<description></description>
+		<content:encoded><![CDATA[Just a status]]></content:encoded>
+		<excerpt:encoded><![CDATA[]]></excerpt:encoded>
+		<wp:post_id>11</wp:post_id>
+		<wp:post_date><![CDATA[2024-10-04 10:00:00]]></wp:post_date>
+		<wp:post_date_gmt><![CDATA[2024-10-04 02:00:00]]></wp:post_date_gmt>
+		<wp:post_modified><![CDATA[2024-10-04 10:00:00]]></wp:post_modified>
+		<wp:post_modified_gmt><![CDATA[2024-10-04 02:00:00]]></wp:post_modified_gmt>
+		<wp:comment_status><![CDATA[open]]></wp:comment_status>
+		<wp:ping_status><![CDATA[open]]></wp:ping_status>
+		<wp:post_name><![CDATA[status]]></wp:post_name>
+		<wp:status><![CDATA[publish]]></wp:status>
+		<wp:post_parent>0</wp:post_parent>
+		<wp:menu_order>0</wp:menu_order>
+		<wp:post_type><![CDATA[post]]></wp:post_type>
+		<wp:post_password><![CDATA[secret]]></wp:post_password>
+		<wp:is_sticky>0</wp:is_sticky>
+		<category domain="category" nicename="tech"><![CDATA[Tech]]></category>
+		<wp:comment><wp:comment_id>103</wp:comment_id><wp:comment_author><![CDATA[Bob]]></wp:comment_author><wp:comment_author_email><![CDATA[bob@example.com]]></wp:comment_author_email><wp:comment_author_url></wp:comment_author_url><wp:comment_author_IP><![CDATA[127.0.0.3]]></wp:comment_author_IP><wp:comment_date><![CDATA[2024-10-05 10:00:00]]></wp:comment_date><wp:comment_date_gmt><![CDATA[2024-10-05 02:00:00]]></wp:comment_date_gmt><wp:comment_content><![CDATA[On a note]]></wp:comment_content><wp:comment_approved><![CDATA[1]]></wp:comment_approved><wp:comment_type><![CDATA[comment]]></wp:comment_type><wp:comment_parent>0</wp:comment_parent><wp:comment_user_id>0</wp:comment_user_id></wp:comment>
+	</item>
+	<item>
+		<title>About</title>
+		<link>https://blog.example.com/about</link>
+		<dc:creator><![CDATA[admin]]></dc:creator>
+		<guid isPermaLink="false">https://blog.example.com/?page_id=12</guid>
+		<description></description>
+		<content:encoded><![CDATA[<h2>About</h2><p>Me</p>]]></content:encoded>
+		<excerpt:encoded><![CDATA[]]></excerpt:encoded>
+		<wp:post_id>12</wp:post_id>
+		<wp:post_date><![CDATA[2024-09-01 10:00:00]]></wp:post_date>
+		<wp:post_date_gmt><![CDATA[2024-09-01 02:00:00]]></wp:post_date_gmt>
+		<wp:post_modified><![CDATA[2024-09-01 10:00:00]]></wp:post_modified>
+		<wp:post_modified_gmt><![CDATA[2024-09-01 02:00:00]]></wp:post_modified_gmt>
+		<wp:comment_status><![CDATA[closed]]></wp:comment_status>
+		<wp:ping_status><![CDATA[closed]]></wp:ping_status>
+		<wp:post_name><![CDATA[about]]></wp:post_name>
+		<wp:status><![CDATA[publish]]></wp:status>
+		<wp:post_parent>0</wp:post_parent>
+		<wp:menu_order>0</wp:menu_order>
+		<wp:post_type><![CDATA[page]]></wp:post_type>
+		<wp:post_password><![CDATA[]]></wp:post_password>
+		<wp:is_sticky>0</wp:is_sticky>
+	</item>
+</channel>
+</rss>
+"""
+
+
+def migrate_to_notes_func(post_data):
+    return post_data["password"] is not None
+
+
+@pytest.fixture
+def make_export(tmp_path):
+    """
+    将示例导出文件写入 tmp_path 并返回其路径，post_date 为第一篇文章的发布时间
+    """
+    def make(post_date="2024-10-01 10:00:00", name="export.xml"):
+        path = tmp_path / name
+        path.write_text(EXPORT_TEMPLATE.replace("{post_date}", post_date), encoding="utf-8")
+        return str(path)
+    return make
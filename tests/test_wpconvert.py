@@ -0,0 +1,19 @@
+from conftest import migrate_to_notes_func
+from wpmigration import StageProfiler, convert_to_bson
+
+
+def _stage_items(export_path, output_dir, **kwargs):
+    profiler = StageProfiler(trace_memory=False)
+    convert_to_bson(export_path, output_dir, migrate_to_notes_func=migrate_to_notes_func, profiler=profiler, **kwargs)
+    return {stage["name"]: stage["items"] for stage in profiler.stages}
+
+
+def test_spilled_profile_counts_match_in_memory(make_export, tmp_path):
+    export_path = make_export()
+    in_memory = _stage_items(export_path, str(tmp_path / "output"))
+    spilled = _stage_items(export_path, str(tmp_path / "output_spilled"), spill_path=str(tmp_path / "spill.db"))
+
+    assert in_memory["migrate_posts_to_notes"] == 1
+    for name in ("create_migrations", "process_posts", "process_pages", "process_comments",
+                 "link_comments", "assign_comment_keys", "migrate_posts_to_notes"):
+        assert spilled[name] == in_memory[name], name
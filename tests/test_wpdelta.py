@@ -0,0 +1,44 @@
+import os
+
+import bson
+
+from conftest import migrate_to_notes_func
+from wpmigration import convert_to_bson, delta_saver, stable_object_id
+
+
+def _run(export_path, state_path, output_dir):
+    return convert_to_bson(
+        export_path, migrate_to_notes_func=migrate_to_notes_func, stable_ids=True,
+        save_func=delta_saver(state_path, output_dir)
+    )
+
+
+def test_stable_object_id_ignores_dates():
+    assert stable_object_id("post", 10) == stable_object_id("post", "10")
+    assert stable_object_id("post", 10) != stable_object_id("comment", 10)
+
+
+def test_rerun_with_changed_post_date_updates_in_place(make_export, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    output_dir = str(tmp_path / "output_delta")
+    first = _run(make_export("2024-10-01 10:00:00"), state_path, output_dir)
+    second = _run(make_export("2024-12-24 08:30:00"), state_path, output_dir)
+
+    assert first["posts"][0]["_id"] == second["posts"][0]["_id"]
+    assert [comment["ref"] for comment in first["comments"]] == [comment["ref"] for comment in second["comments"]]
+    # 只有改了日期的文章需要更新，没有删除
+    assert sorted(os.listdir(output_dir)) == ["posts.upsert.bson"]
+    with open(os.path.join(output_dir, "posts.upsert.bson"), "rb") as f:
+        upserted = bson.decode_all(f.read())
+    assert [document["_id"] for document in upserted] == [second["posts"][0]["_id"]]
+
+
+def test_unchanged_rerun_clears_previous_delta(make_export, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    output_dir = str(tmp_path / "output_delta")
+    export_path = make_export()
+    _run(export_path, state_path, output_dir)
+    assert "posts.upsert.bson" in os.listdir(output_dir)
+
+    _run(export_path, state_path, output_dir)
+    assert os.listdir(output_dir) == []
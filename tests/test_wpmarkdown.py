@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+pytest.importorskip("markdownify")
+
+from markdown_corpus import CASES, check, generate  # noqa: E402
+
+# markdownify 对看起来像文件名或链接的短文档发出的警告
+pytestmark = pytest.mark.filterwarnings("ignore::bs4.MarkupResemblesLocatorWarning")
+
+
+@pytest.mark.parametrize("html", CASES)
+def test_native_converter_matches_markdownify(html):
+    assert check([html]) == []
+
+
+def test_native_converter_matches_markdownify_on_generated_documents():
+    assert check(generate(300, seed=0)) == []
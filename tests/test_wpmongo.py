@@ -0,0 +1,99 @@
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import migrate_to_notes_func
+from wpmigration import apply_delta_to_mongo, compute_delta, convert_to_bson, save_migrations_to_mongo
+from wpmigration.wpmongo import _map_bounded
+
+
+def test_map_bounded_limits_batches_in_flight():
+    lock = threading.Lock()
+    state = {"taken": 0, "done": 0, "max_in_flight": 0}
+    release = threading.Event()
+
+    def batches():
+        for index in range(20):
+            with lock:
+                state["taken"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["taken"] - state["done"])
+            yield [index]
+
+    def write(batch):
+        release.wait()
+        with lock:
+            state["done"] += 1
+        return len(batch)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = _map_bounded(executor, write, batches(), 4)
+        time.sleep(0.05)
+        release.set()
+        assert sum(results) == 20
+    assert state["max_in_flight"] <= 5
+
+
+@pytest.fixture(scope="module")
+def mongod(tmp_path_factory):
+    """
+    在临时目录启动一个 mongod，没有安装 mongod 时跳过
+    """
+    executable = shutil.which("mongod")
+    if executable is None:
+        pytest.skip("mongod is not installed")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    db_path = tmp_path_factory.mktemp("mongod")
+    process = subprocess.Popen(
+        [executable, "--dbpath", str(db_path), "--port", str(port), "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    uri = f"mongodb://127.0.0.1:{port}"
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=500)
+    try:
+        for _ in range(60):
+            try:
+                client.admin.command("ping")
+                break
+            except Exception:
+                time.sleep(0.5)
+        else:
+            pytest.skip("mongod did not start")
+        yield uri
+    finally:
+        client.close()
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def test_save_and_apply_delta(mongod, make_export, tmp_path):
+    from pymongo import MongoClient
+
+    migrations = convert_to_bson(
+        make_export(), str(tmp_path / "output"), migrate_to_notes_func=migrate_to_notes_func, stable_ids=True,
+        save_func=lambda migrations: None
+    )
+    counts = save_migrations_to_mongo(migrations, mongod, "test", batch_size=1, max_pool_size=2, upsert=True)
+    assert counts == {name: len(documents) for name, documents in migrations.items()}
+
+    delta, state = compute_delta(migrations, {})
+    removed = migrations["comments"].pop()
+    delta, _ = compute_delta(migrations, state)
+    counts = apply_delta_to_mongo(delta, mongod, "test", batch_size=1, max_pool_size=2)
+    assert counts["comments"] == {"upserted": 0, "deleted": 1}
+
+    client = MongoClient(mongod)
+    try:
+        db = client["test"]
+        assert db.comments.count_documents({}) == len(migrations["comments"])
+        assert db.comments.find_one({"_id": removed["_id"]}) is None
+        assert db.posts.count_documents({}) == len(migrations["posts"])
+    finally:
+        client.close()
@@ -0,0 +1,12 @@
+from conftest import migrate_to_notes_func
+from wpmigration import convert_to_bson, verify_bson
+
+
+def test_verify_accepts_pingbacks_without_email(make_export, tmp_path):
+    output_dir = str(tmp_path / "output")
+    migrations = convert_to_bson(make_export(), output_dir, migrate_to_notes_func=migrate_to_notes_func)
+    assert any(comment["mail"] is None for comment in migrations["comments"])
+
+    report = verify_bson(output_dir)
+    assert report["ok"], report
+    assert report["collections"]["comments"]["documents"] == len(migrations["comments"])
@@ -0,0 +1,13 @@
+from wpmigration import verify_bson
+import argparse
+import logging
+import sys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校验 convert_to_bson 输出的 bson 文件，只输出有问题的文档")
+    parser.add_argument("output_dir", nargs="?", default="output")
+    parser.add_argument("--limit", type=int, default=20, help="最多输出的问题文档数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sys.exit(0 if verify_bson(args.output_dir, args.limit)["ok"] else 1)
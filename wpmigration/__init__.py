@@ -1,3 +1,12 @@
+from .wparchive import *
+from .wpcache import *
 from .wpconvert import *
+from .wpdelta import *
+from .wpfetch import *
 from .wpfile import *
-from .wpparser import *
\ No newline at end of file
+from .wpmarkdown import *
+from .wpmedia import *
+from .wpmongo import *
+from .wpparser import *
+from .wpprofile import *
+from .wpverify import *
\ No newline at end of file
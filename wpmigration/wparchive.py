@@ -0,0 +1,103 @@
+import os
+import re
+import bson
+import shutil
+import logging
+import time
+import zipfile
+from itertools import islice
+from .wpconvert import write_bson
+
+logger = logging.getLogger(__name__)
+
+# 备份压缩包中 mongodump 生成的集合文件，例如 mx-space/posts.bson
+COLLECTION_ENTRY_PATTERN = re.compile(r"^(?P<root>(?:.*/)?)mx-space/(?P<name>[^/]+)\.bson$")
+MEDIA_DIR = "backup_data/static/file/"
+# 本身已压缩的图片格式，放入压缩包时不再压缩
+STORED_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".heic", ".zip", ".gz", ".mp4", ".mp3"}
+
+def write_backup_archive(
+    backup_path: str,
+    output_path: str,
+    migrations: dict,
+    files_dir: str = None,
+    compresslevel: int = None
+) -> dict:
+    """
+    读取 Mix Space 后台导出的备份压缩包，一次写出替换了迁移数据的新压缩包，不解压到磁盘
+    其余条目原样流式复制（保持原压缩方式），migrations 中的集合替换 mx-space/{集合名}.bson（压缩包中没有时新增），
+    files_dir 不为空时其中的文件写入 backup_data/static/file/，同名的原有文件被替换
+    返回复制、替换与新增的条目数
+    """
+    if os.path.abspath(backup_path) == os.path.abspath(output_path):
+        raise ValueError("output_path must differ from backup_path.")
+    media_files = sorted(os.listdir(files_dir)) if files_dir else []
+
+    start = time.perf_counter()
+    tmp_output_path = output_path + ".tmp"
+    stats = {"copied": 0, "collections": 0, "media": 0}
+    with zipfile.ZipFile(backup_path, "r") as zin:
+        root = ""
+        for info in zin.infolist():
+            match = COLLECTION_ENTRY_PATTERN.match(info.filename)
+            if match:
+                root = match.group("root")
+                break
+        collection_prefix = root + "mx-space/"
+        media_prefix = root + MEDIA_DIR
+        replaced = {collection_prefix + f"{name}.bson" for name in migrations}
+        replaced.update(media_prefix + file_name for file_name in media_files)
+
+        with zipfile.ZipFile(tmp_output_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=compresslevel) as zout:
+            for info in zin.infolist():
+                if info.filename in replaced:
+                    continue
+                _copy_entry(zin, zout, info)
+                stats["copied"] += 1
+
+            for name, documents in migrations.items():
+                info = zipfile.ZipInfo(collection_prefix + f"{name}.bson", time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                with zout.open(info, "w", force_zip64=_needs_zip64(documents)) as f:
+                    write_bson(f, documents)
+                stats["collections"] += 1
+
+            for file_name in media_files:
+                path = os.path.join(files_dir, file_name)
+                compress_type = zipfile.ZIP_STORED if os.path.splitext(file_name)[1].lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                zout.write(path, media_prefix + file_name, compress_type=compress_type)
+                stats["media"] += 1
+    os.replace(tmp_output_path, output_path)
+
+    logger.info(
+        "Wrote %s in %.2fs: %d entries copied, %d collections and %d media files written",
+        output_path, time.perf_counter() - start, stats["copied"], stats["collections"], stats["media"]
+    )
+    return stats
+
+def _copy_entry(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    逐块解压并重新压缩单个条目，保留文件名、时间、权限与压缩方式
+    """
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.create_system = info.create_system
+    new_info.comment = info.comment
+    if info.is_dir():
+        zout.writestr(new_info, b"")
+        return
+    new_info.file_size = info.file_size
+    with zin.open(info) as fsrc, zout.open(new_info, "w") as fdst:
+        shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+def _needs_zip64(documents: list) -> bool:
+    """
+    写入前不知道集合的 BSON 大小，按前 1000 个文档的平均大小估计是否会超过 4 GiB
+    """
+    sample = list(islice(documents, 1000))
+    if not sample:
+        return False
+    estimated = sum(len(bson.encode(document)) for document in sample) / len(sample) * len(documents)
+    return estimated * 1.5 > zipfile.ZIP64_LIMIT
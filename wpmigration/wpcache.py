@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from importlib.metadata import version, PackageNotFoundError
+from .wpmarkdown import NATIVE_ENABLED, NATIVE_CONVERTER_VERSION
+
+logger = logging.getLogger(__name__)
+
+def converter_version() -> str:
+    """
+    当前 HTML 转 Markdown 转换器的版本，作为缓存键的一部分，升级转换器后旧缓存自动失效
+    """
+    try:
+        markdownify_version = f"markdownify-{version('markdownify')}"
+    except PackageNotFoundError:
+        markdownify_version = "markdownify-unknown"
+    if NATIVE_ENABLED:
+        return f"{markdownify_version}+native-{NATIVE_CONVERTER_VERSION}"
+    return markdownify_version
+
+class MarkdownCache:
+    """
+    基于 SQLite 的 Markdown 转换结果缓存，键为原始 HTML 与转换器版本的哈希
+    缓存内容总长度（字符数）超过 max_size 后按最近使用时间淘汰 (LRU)
+    """
+
+    def __init__(self, path: str, max_size: int = 512 * 1024 * 1024, version: str = None):
+        self.path = path
+        self.max_size = max_size
+        self.version = version or converter_version()
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS markdown ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS markdown_last_used ON markdown (last_used)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def key(self, html: str) -> str:
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0")
+        digest.update(html.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get_many(self, htmls: list) -> list:
+        """
+        批量查询缓存，返回与输入等长的列表，未命中的位置为 None
+        """
+        keys = [self.key(html) for html in htmls]
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT key, value FROM markdown WHERE key IN ({placeholders})", batch
+            ))
+        now = time.time_ns()
+        self._conn.executemany(
+            "UPDATE markdown SET last_used = ? WHERE key = ?",
+            ((now, key) for key in found)
+        )
+        values = [found.get(key) for key in keys]
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def put_many(self, htmls: list, values: list):
+        now = time.time_ns()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO markdown (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (
+                (self.key(html), value, len(value), now)
+                for html, value in zip(htmls, values)
+            )
+        )
+        self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        淘汰最久未使用的条目，直到总大小不超过 max_size，返回淘汰数
+        """
+        total = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM markdown ORDER BY last_used DESC"):
+            total += size
+            if total > self.max_size:
+                stale.append((key,))
+        self._conn.executemany("DELETE FROM markdown WHERE key = ?", stale)
+        self._conn.commit()
+        return len(stale)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"Markdown cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        if self._conn is None:
+            return
+        evicted = self.evict()
+        logger.info(self.summary() + (f", {evicted} entries evicted" if evicted else ""))
+        self._conn.close()
+        self._conn = None
@@ -1,20 +1,46 @@
-from .wpparser import wpparse
+from .wpparser import wpparse, wpparse_many, wpiterparse, _build_category_tree
+from .wpcache import MarkdownCache
+from .wpprofile import StageProfiler
+from .wpmedia import build_attachment_index, attachment_pic_func
+from .wpspill import SpillStore
+from .wpmarkdown import fast_markdownify
 import os
 import re
 import json
 import bson
+import hashlib
 import collections
-from markdownify import markdownify
+import itertools
+from collections.abc import MutableMapping
+import logging
 from urllib.parse import unquote
 from datetime import datetime
 from bson import ObjectId
 from typing import Union
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 转换过程实际用到的字段，解析时只提取这些字段以减少内存占用
+CONVERTER_PROJECTION = {
+    "item": [
+        "title", "guid", "content", "excerpt", "post_id", "post_date", "post_modified", "status",
+        "post_type", "post_name", "categories", "comment_status", "post_password", "tags",
+        "custom_fields", "postmeta", "comments",
+    ],
+    "comment": [
+        "id", "author", "author_email", "author_url", "author_ip", "date", "content", "approved", "parent",
+    ],
+}
+
+# markdownify 输出中的图片语法，以及被转义后的 Tablepress 短代码 \[table id\=N /]
+CONTENT_TOKEN_PATTERN = re.compile(r"!\[.*?\]\((?P<pic_url>.*?)\)|\\\[table id\\=(?P<table_id>[^\s\]]+) /\]")
 
 def convert_keys_and_values(data):
     """
     将字典中的键和值转换为字符串，以便序列化为 JSON
     """
-    if isinstance(data, dict):
+    if isinstance(data, MutableMapping):
         return {str(key): convert_keys_and_values(value) for key, value in data.items()}
     elif isinstance(data, list):
         return [convert_keys_and_values(element) for element in data]
@@ -36,37 +62,340 @@ def format_datetime(date: Union[str, datetime]):
     
     return date
     
+def stable_object_id(kind: str, wp_id) -> ObjectId:
+    """
+    由 WordPress 的 term_id / post_id / comment_id 生成固定的 ObjectId，重复运行结果不变
+    12 字节全部取 kind 与 wp_id 的 SHA-1 摘要，修改发布时间或发布草稿（会改写 post_date）后 _id 也不变
+    """
+    digest = hashlib.sha1(f"{kind}:{wp_id}".encode("utf-8")).digest()
+    return ObjectId(digest[:12])
+
+def _new_object_id(stable_ids: bool, kind: str, wp_id) -> ObjectId:
+    return stable_object_id(kind, wp_id) if stable_ids else ObjectId()
+
+def markdownify_many(
+    htmls: list,
+    workers: int = 1,
+    chunksize: int = 64,
+    cache: MarkdownCache = None,
+    converter: callable = fast_markdownify
+) -> list:
+    """
+    批量将 HTML 转换为 Markdown，结果顺序与输入一致
+    workers 大于 1 时使用多进程并行转换（None 表示使用全部 CPU 核心），chunksize 为每批发送给子进程的数量
+    传入 cache 时先查询缓存，只转换未命中的内容
+    converter 默认为 fast_markdownify（输出与 markdownify 相同），多进程时须为模块级函数
+    """
+    if cache is not None:
+        results = cache.get_many(htmls)
+        missing = [index for index, value in enumerate(results) if value is None]
+        converted = markdownify_many([htmls[index] for index in missing], workers, chunksize, converter=converter)
+        for index, value in zip(missing, converted):
+            results[index] = value
+        cache.put_many([htmls[index] for index in missing], converted)
+        return results
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(htmls) <= chunksize:
+        return [converter(html) for html in htmls]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(converter, htmls, chunksize=chunksize))
+
 def json_array_to_bson(json_array: list):
     """
     将 JSON 数组转换为 BSON 格式
     """
     return b''.join(bson.encode(json_obj) for json_obj in json_array)
 
+def write_bson(f, documents, buffer_size: int = 1 << 20) -> int:
+    """
+    将文档逐个编码为 BSON 并分批写入文件对象，返回写入的文档数
+    documents 可以是列表或生成器，编码结果先写入一个复用的缓冲区，超过 buffer_size 字节后统一写出
+    """
+    buffer = bytearray()
+    count = 0
+    for document in documents:
+        buffer += bson.encode(document)
+        count += 1
+        if len(buffer) >= buffer_size:
+            f.write(buffer)
+            buffer.clear()
+    if buffer:
+        f.write(buffer)
+    return count
+
+def save_migrations_to_json(
+    migrations: dict,
+    path: str = "output.json",
+    split: bool = False,
+    sample: int = None
+):
+    """
+    逐个文档写出用于检查的 JSON，不在内存中构造完整的 JSON 字符串
+    split 为 True 时 path 为目录，每个集合写入单独的 {集合名}.json
+    sample 不为空时每个集合只写出前 sample 个文档
+    """
+    if split:
+        if not os.path.exists(path):
+            os.mkdir(path)
+        for key, value in migrations.items():
+            with open(os.path.join(path, f"{key}.json"), "w") as f:
+                _write_json_array(f, value, sample, "")
+        return
+
+    with open(path, "w") as f:
+        f.write("{")
+        for index, (key, value) in enumerate(migrations.items()):
+            f.write("," if index else "")
+            f.write(f"\n    {json.dumps(key)}: ")
+            _write_json_array(f, value, sample, "    ")
+        f.write("\n}" if migrations else "}")
+
+def _write_json_array(f, documents, sample: int = None, indent: str = ""):
+    """
+    写出与 json.dumps(..., indent=4) 相同格式的数组，indent 为数组所在层级的缩进
+    """
+    if sample is not None:
+        documents = itertools.islice(documents, sample)
+    empty = True
+    for document in documents:
+        f.write(",\n" if not empty else "[\n")
+        empty = False
+        text = json.dumps(convert_keys_and_values(document), indent=4)
+        f.write(indent + "    " + text.replace("\n", "\n" + indent + "    "))
+    f.write("[]" if empty else f"\n{indent}]")
+
 def convert_to_bson(
-    wp_xml_file_path: str, 
+    wp_xml_file_path: Union[str, list],
     output_dir: str = "output",
     migrate_pic_func: callable = None,
     migrate_to_notes_func: callable = None,
-    migrate_draft_posts: bool = False
+    migrate_draft_posts: bool = False,
+    stream: bool = False,
+    workers: int = 1,
+    chunksize: int = 64,
+    cache_path: str = None,
+    cache_max_size: int = 512 * 1024 * 1024,
+    save_func: callable = None,
+    profiler: StageProfiler = None,
+    media: dict = None,
+    stable_ids: bool = False,
+    spill_path: str = None,
+    batch_size: int = 1000,
+    parse_workers: int = None
 ) -> dict:
     """
     将 WordPress 导出的 XML 文件转换为 BSON 格式
+    wp_xml_file_path 可以是多个导出文件路径的列表，此时用 parse_workers 个进程并行解析后合并（None 表示每个文件一个进程，见 wpparse_many）
+    stream 为 True 时使用 iterparse 逐条解析，不在内存中保留整个 XML 树，但解析出的条目仍全部保存在内存中再转换，
+    峰值内存仍与导出文件大小成正比；需要限制内存占用时使用 spill_path
+    workers / chunksize 控制 HTML 转 Markdown 的并行进程数与批大小，见 markdownify_many
+    cache_path 不为空时将转换结果缓存到该 SQLite 文件，重复运行时跳过未变化的内容
+    save_func 不为空时用它代替写入 output_dir 保存结果，例如 mongo_saver(...) 直接写入 MongoDB
+    profiler 为 StageProfiler 时记录每个阶段的耗时、内存与条目数
+    media 为字典时根据 attachment 条目建立图片索引 (见 build_attachment_index)，缩略图链接统一换成原图链接后
+    再交给 migrate_pic_func，并将引用到的原图相对路径写入 media["referenced"]、uploads 下无对应附件的链接写入 media["dangling"]，
+    可配合 move_files_and_rename(only_files=media["referenced"]) 只复制被引用的文件；
+    交给 migrate_pic_func 的链接与替换结果写入 media["images"]，可用 find_missing_images / fetch_images 下载本地缺失的图片
+    stable_ids 为 True 时由 term_id / post_id / comment_id 生成固定的 _id (见 stable_object_id)，
+    多次运行的结果可以直接比较，配合 delta_saver(...) 只输出变化的文档
+    spill_path 不为空时使用该 SQLite 文件作为中间存储 (见 SpillStore)：逐条解析并写入磁盘，每次只在内存中处理 batch_size 个条目，
+    返回的各集合为从该文件逐个读取文档的 SpilledCollection，内存占用与导出文件大小无关，stream 参数被忽略
+    """
+    if profiler is None:
+        profiler = StageProfiler(trace_memory=False)
+    if spill_path is not None:
+        return _convert_spilled(
+            wp_xml_file_path, spill_path, batch_size, output_dir, migrate_pic_func, migrate_to_notes_func, migrate_draft_posts,
+            workers, chunksize, cache_path, cache_max_size, save_func, profiler, media, stable_ids
+        )
+    with profiler:
+        with profiler.stage("wpparse") as stage:
+            if isinstance(wp_xml_file_path, (list, tuple)):
+                result = wpparse_many(wp_xml_file_path, stream=stream, records=True, projection=CONVERTER_PROJECTION, workers=parse_workers or len(wp_xml_file_path))
+            else:
+                result = wpparse(wp_xml_file_path, stream=stream, records=True, projection=CONVERTER_PROJECTION)
+            stage["items"] = sum(len(items) for items in result["items"].values())
+        with profiler.stage("process_tablepress_tables") as stage:
+            tables = _process_tablepress_tables(result)
+            stage["items"] = len(tables)
+        if media is not None:
+            with profiler.stage("build_attachment_index") as stage:
+                migrate_pic_func = _setup_media(media, result["items"].get("attachment", []), migrate_pic_func)
+                stage["items"] = len(media["index"]["files"])
+        cache = MarkdownCache(cache_path, cache_max_size) if cache_path else None
+        try:
+            with profiler.stage("process_content") as stage:
+                _process_content(result, tables, migrate_pic_func, workers, chunksize, cache)
+                stage["items"] = sum(len(result["items"].get(_type, [])) for _type in ["post", "page"])
+            _report_dangling(media)
+            with profiler.stage("create_migrations") as stage:
+                migrations, indexes = _create_migrations(result, stable_ids)
+                stage["items"] = len(migrations["categories"])
+            with profiler.stage("process_posts") as stage:
+                _process_posts(result, migrations, indexes, migrate_draft_posts, stable_ids)
+                stage["items"] = len(migrations["posts"])
+            with profiler.stage("process_pages") as stage:
+                _process_pages(result, migrations, indexes, stable_ids)
+                stage["items"] = len(migrations["pages"])
+            with profiler.stage("process_comments") as stage:
+                _process_comments(result, migrations, indexes, workers, chunksize, cache, stable_ids)
+                stage["items"] = len(migrations["comments"])
+        finally:
+            if cache is not None:
+                cache.close()
+        with profiler.stage("link_comments") as stage:
+            _link_comments(migrations)
+            stage["items"] = len(migrations["comments"])
+        with profiler.stage("assign_comment_keys") as stage:
+            _assign_comment_keys(migrations)
+            stage["items"] = len(migrations["comments"])
+        with profiler.stage("migrate_posts_to_notes") as stage:
+            _migrate_posts_to_notes(migrations, migrate_to_notes_func)
+            stage["items"] = len(migrations["notes"])
+        _save_migrations(migrations, output_dir, save_func, profiler)
+    return migrations
+
+def _convert_spilled(
+    wp_xml_file_path: Union[str, list],
+    spill_path: str,
+    batch_size: int,
+    output_dir: str,
+    migrate_pic_func: callable,
+    migrate_to_notes_func: callable,
+    migrate_draft_posts: bool,
+    workers: int,
+    chunksize: int,
+    cache_path: str,
+    cache_max_size: int,
+    save_func: callable,
+    profiler: StageProfiler,
+    media: dict,
+    stable_ids: bool
+) -> dict:
+    """
+    使用 SpillStore 的 convert_to_bson，各阶段与内存中的实现一一对应，结果相同
     """
-    result = wpparse(wp_xml_file_path)
-    result = convert_keys_and_values(result)
-    tables = _process_tablepress_tables(result)
-    _process_content(result, tables, migrate_pic_func)
-    migrations = _create_migrations(result)
-    _process_posts(result, migrations, migrate_draft_posts)
-    _process_pages(result, migrations)
-    _process_comments(result, migrations)
-    _link_comments(migrations)
-    _assign_comment_keys(migrations)
-    _migrate_posts_to_notes(migrations, migrate_to_notes_func)
-    _remove_posts_existed_in_notes(migrations)
-    _save_migrations_to_bson(migrations, output_dir)
+    paths = list(wp_xml_file_path) if isinstance(wp_xml_file_path, (list, tuple)) else [wp_xml_file_path]
+    store = SpillStore(spill_path)
+    with profiler:
+        try:
+            with profiler.stage("wpparse") as stage:
+                reference = {}
+                stage["items"] = 0
+                for path in paths:
+                    for kind, data in wpiterparse(path, records=True, projection=CONVERTER_PROJECTION):
+                        if kind == "item":
+                            store.add_item(data, merge=len(paths) > 1)
+                            stage["items"] += 1
+                        elif kind == "category":
+                            reference.setdefault(data["nicename"], data)
+            with profiler.stage("process_tablepress_tables") as stage:
+                tables = _process_tablepress_tables({"items": {
+                    "tablepress_table": [item for items in store.iter_items("tablepress_table", batch_size) for item in items]
+                }})
+                stage["items"] = len(tables)
+            if media is not None:
+                with profiler.stage("build_attachment_index") as stage:
+                    attachments = (item for items in store.iter_items("attachment", batch_size) for item in items)
+                    migrate_pic_func = _setup_media(media, attachments, migrate_pic_func)
+                    stage["items"] = len(media["index"]["files"])
+            with profiler.stage("create_migrations") as stage:
+                migrations, indexes = _create_migrations({"categories": _build_category_tree(None, reference=reference)}, stable_ids)
+                for category in migrations["categories"]:
+                    store.add_document("categories", category)
+                stage["items"] = len(migrations["categories"])
+
+            tables_by_id = {table["id"]: table["content"] for table in tables}
+            pic_urls = {}
+            cache = MarkdownCache(cache_path, cache_max_size) if cache_path else None
+            try:
+                with profiler.stage("process_posts") as stage:
+                    stage["items"] = 0
+                    nid = 0
+                    for posts in store.iter_items("post", batch_size):
+                        _convert_contents(posts, tables_by_id, migrate_pic_func, workers, chunksize, cache, pic_urls)
+                        for post in posts:
+                            data = _create_post(post, _resolve_category(indexes, post), migrate_draft_posts, stable_ids)
+                            _warn_duplicate_item(store, "post", post)
+                            original = data.pop("original")
+                            if migrate_to_notes_func and migrate_to_notes_func(original):
+                                nid += 1
+                                store.add_document("notes", _create_note(data, original, nid), "post", post["post_id"])
+                            else:
+                                store.add_document("posts", data, "post", post["post_id"])
+                            stage["items"] += 1
+                with profiler.stage("process_pages") as stage:
+                    stage["items"] = 0
+                    for pages in store.iter_items("page", batch_size):
+                        _convert_contents(pages, tables_by_id, migrate_pic_func, workers, chunksize, cache, pic_urls)
+                        for page in pages:
+                            _warn_duplicate_item(store, "page", page)
+                            store.add_document("pages", _create_page(page, stage["items"], stable_ids), "page", page["post_id"])
+                            stage["items"] += 1
+                _report_dangling(media)
+                with profiler.stage("process_comments") as stage:
+                    stage["items"] = 0
+                    for _type in ["post", "page"]:
+                        for items in store.iter_items(_type, batch_size):
+                            _convert_comments(items, workers, chunksize, cache)
+                            for item in items:
+                                if not item["comments"]:
+                                    continue
+                                ref_id = store.find_document_id(_type, item["post_id"])
+                                if ref_id is None:
+                                    logger.warning("Comments of %s %s (%r) have no target", _type, item["post_id"], item["title"])
+                                for comment in item["comments"]:
+                                    store.add_comment(_create_comment(comment, ref_id, _type, stable_ids))
+                                    stage["items"] += 1
+            finally:
+                if cache is not None:
+                    cache.close()
+
+            # 条目数与内存中的实现相同：评论总数与手记数
+            with profiler.stage("link_comments") as stage:
+                store.link_comments()
+                stage["items"] = store.count_documents("comments")
+            with profiler.stage("assign_comment_keys") as stage:
+                store.assign_comment_keys()
+                stage["items"] = store.count_documents("comments")
+            with profiler.stage("migrate_posts_to_notes") as stage:
+                store.mark_note_comments()
+                stage["items"] = store.count_documents("notes")
+            migrations = store.migrations()
+        finally:
+            store.close()
+        _save_migrations(migrations, output_dir, save_func, profiler)
     return migrations
 
+def _setup_media(media: dict, attachments, migrate_pic_func: callable = None) -> callable:
+    media["index"] = build_attachment_index(attachments)
+    media["referenced"] = set()
+    media["dangling"] = set()
+    media["images"] = {}
+    media["canonical"] = {}
+    return attachment_pic_func(media, migrate_pic_func)
+
+def _report_dangling(media: dict):
+    if media is not None and media["dangling"]:
+        logger.warning(
+            "%d image links point into uploads but match no attachment: %s",
+            len(media["dangling"]), ", ".join(sorted(media["dangling"])[:10])
+        )
+
+def _warn_duplicate_item(store: SpillStore, _type: str, item):
+    if store.find_document_id(_type, item["post_id"]) is not None:
+        logger.warning("Duplicate %s id %s (%r), comments will refer to the first one", _type, item["post_id"], item["title"])
+
+def _save_migrations(migrations: dict, output_dir: str, save_func: callable, profiler: StageProfiler):
+    with profiler.stage("save_migrations") as stage:
+        if save_func is not None:
+            save_func(migrations)
+        else:
+            _save_migrations_to_bson(migrations, output_dir)
+        stage["items"] = sum(len(documents) for documents in migrations.values())
+
 def _process_tablepress_tables(result):
     """
     Tablepress 插件的表格导出
@@ -86,28 +415,75 @@ def _process_tablepress_tables(result):
         result["items"].pop("tablepress_table")
     return tables
 
-def _process_content(result: dict, tables: list, migrate_pic_func: callable = None):
-    for _type in ['post', 'page']:
-        if _type in result["items"]:
-            for item in result["items"][_type]:
-                if item["content"]:
-                    item["content"] = markdownify(item["content"])
-                    if migrate_pic_func is not None:
-                        pattern = re.compile(r"!\[.*?\]\((.*?)\)")
-                        pictures = pattern.findall(item["content"])
-                        for pic_url in pictures:
-                            new_pic_url = migrate_pic_func(pic_url)
-                            item["content"] = item["content"].replace(pic_url, new_pic_url)
-
-                    for table in tables:
-                        item["content"] = item["content"].replace(f"\[table id\={table['id']} /]", table["content"])
-
-def _create_migrations(result):
+def _process_content(
+    result: dict,
+    tables: list,
+    migrate_pic_func: callable = None,
+    workers: int = 1,
+    chunksize: int = 64,
+    cache: MarkdownCache = None
+):
+    items = [
+        item
+        for _type in ['post', 'page'] if _type in result["items"]
+        for item in result["items"][_type]
+    ]
+    tables_by_id = {table["id"]: table["content"] for table in tables}
+    _convert_contents(items, tables_by_id, migrate_pic_func, workers, chunksize, cache, {})
+
+def _convert_contents(
+    items: list,
+    tables_by_id: dict,
+    migrate_pic_func: callable = None,
+    workers: int = 1,
+    chunksize: int = 64,
+    cache: MarkdownCache = None,
+    pic_urls: dict = None
+):
+    """
+    将 items 的正文转换为 Markdown 并替换图片链接、展开表格，空正文保持不变
+    """
+    items = [item for item in items if item["content"]]
+    contents = markdownify_many([item["content"] for item in items], workers, chunksize, cache)
+    for item, content in zip(items, contents):
+        item["content"] = _rewrite_content(content, tables_by_id, migrate_pic_func, pic_urls)
+
+def _rewrite_content(
+    content: str,
+    tables_by_id: dict,
+    migrate_pic_func: callable = None,
+    pic_urls: dict = None
+) -> str:
+    """
+    一次扫描完成图片链接替换与 Tablepress 短代码 [table id=N /] 展开
+    只替换图片语法中的链接，pic_urls 用于缓存 migrate_pic_func 的结果
+    """
+    if pic_urls is None:
+        pic_urls = {}
+
+    def replace(match):
+        if match.group("table_id") is not None:
+            return tables_by_id.get(match.group("table_id"), match.group(0))
+        if migrate_pic_func is None:
+            return match.group(0)
+        pic_url = match.group("pic_url")
+        if pic_url not in pic_urls:
+            pic_urls[pic_url] = migrate_pic_func(pic_url)
+        offset = match.start()
+        return (
+            match.group(0)[:match.start("pic_url") - offset]
+            + pic_urls[pic_url]
+            + match.group(0)[match.end("pic_url") - offset:]
+        )
+
+    return CONTENT_TOKEN_PATTERN.sub(replace, content)
+
+def _create_migrations(result, stable_ids: bool = False):
     created_date = datetime.now()
     migrations = {
         "categories": [
             {
-                "_id": ObjectId(),
+                "_id": _new_object_id(stable_ids, "category", category["term_id"]),
                 "name": category["name"],
                 "type": 0,
                 "slug": category["nicename"],
@@ -119,103 +495,170 @@ def _create_migrations(result):
         "pages": [],
         "notes": []
     }
-    return migrations
+    indexes = {
+        "categories": {},
+        "post": {},
+        "page": {},
+    }
+    for category in migrations["categories"]:
+        if category["slug"] in indexes["categories"]:
+            logger.warning("Duplicate category slug %r, keeping the first one", category["slug"])
+            continue
+        indexes["categories"][category["slug"]] = category["_id"]
+    return migrations, indexes
+
+def _index_item(indexes: dict, _type: str, item: dict, _id: ObjectId):
+    """
+    以 WordPress post_id 登记文章 / 页面，供评论等引用直接查找
+    """
+    if item["post_id"] in indexes[_type]:
+        logger.warning("Duplicate %s id %s (%r), comments will refer to the first one", _type, item["post_id"], item["title"])
+        return
+    indexes[_type][item["post_id"]] = _id
+
+def _resolve_category(indexes: dict, post: dict):
+    if not post["categories"]:
+        logger.warning("Post %s (%r) has no category", post["post_id"], post["title"])
+        return None
+    category_id = indexes["categories"].get(post["categories"][0])
+    if category_id is None:
+        logger.warning("Post %s (%r) refers to unknown category %r", post["post_id"], post["title"], post["categories"][0])
+    return category_id
 
 def _process_posts(
     result, 
     migrations, 
-    migrate_draft_posts: bool = False
+    indexes,
+    migrate_draft_posts: bool = False,
+    stable_ids: bool = False
 ):
     for post in result["items"]["post"]:
-        category_id = next((category["_id"] for category in migrations["categories"] if category["slug"] == post["categories"][0]), None)
-        data = {
-            "_id": ObjectId(),
-            "created": format_datetime(post["post_date"]),
-            "commentsIndex": 0,
-            "allowComment": post["comment_status"] == "open",
-            "title": post["title"],
-            "text": post["content"],
-            "images": [],
-            "modified": format_datetime(post["post_modified"]),
-            "slug": post["post_name"],
-            "summary": post["excerpt"],
-            "categoryId": category_id,
-            "copyright": True,
-            "tags": [unquote(tag) for tag in post["tags"]],
-            "count": {
-                "read": int(post["postmeta"].get("views", 0)),
-                "like": int(post["postmeta"].get("love", 0))
-            },
-            "pin": None,
-            "pinOrder": 0,
-            "related": [],
-            "meta": "null",
-            "original": {
-                "password": post["post_password"],
-                "postmeta": post["postmeta"],
-                "custom_fields": post["custom_fields"],
-            }
-        }
+        data = _create_post(post, _resolve_category(indexes, post), migrate_draft_posts, stable_ids)
+        _index_item(indexes, "post", post, data["_id"])
+        migrations["posts"].append(data)
 
-        if migrate_draft_posts and (post["status"] == "draft" or post["post_password"] == "trash"):
-            data["text"] = '' if data["text"] == None else data["text"]
+def _create_post(post, category_id, migrate_draft_posts: bool = False, stable_ids: bool = False) -> dict:
+    created = format_datetime(post["post_date"])
+    data = {
+        "_id": _new_object_id(stable_ids, "post", post["post_id"]),
+        "created": created,
+        "commentsIndex": 0,
+        "allowComment": post["comment_status"] == "open",
+        "title": post["title"],
+        "text": post["content"],
+        "images": [],
+        "modified": format_datetime(post["post_modified"]),
+        "slug": post["post_name"],
+        "summary": post["excerpt"],
+        "categoryId": category_id,
+        "copyright": True,
+        "tags": [unquote(tag) for tag in post["tags"]],
+        "count": {
+            "read": int(post["postmeta"].get("views", 0)),
+            "like": int(post["postmeta"].get("love", 0))
+        },
+        "pin": None,
+        "pinOrder": 0,
+        "related": [],
+        "meta": "null",
+        "original": {
+            "password": post["post_password"],
+            "postmeta": post["postmeta"],
+            "custom_fields": post["custom_fields"],
+        }
+    }
 
-        migrations["posts"].append(data)
+    if migrate_draft_posts and (post["status"] == "draft" or post["post_password"] == "trash"):
+        data["text"] = '' if data["text"] == None else data["text"]
+    return data
 
-def _process_pages(result, migrations):
+def _process_pages(result, migrations, indexes, stable_ids: bool = False):
     for index, page in enumerate(result["items"]["page"]):
-        data = {
-            "_id": ObjectId(),
-            "created": format_datetime(page["post_date"]),
-            "commentsIndex": 0,
-            "allowComment": page["comment_status"] == "open",
-            "title": page["title"],
-            "text": page["content"],
-            "images": [],
-            "modified": format_datetime(page["post_modified"]),
-            "slug": page["post_name"],
-            "subtitle": "",
-            "order": index,
-        }
+        data = _create_page(page, index, stable_ids)
+        _index_item(indexes, "page", page, data["_id"])
         migrations["pages"].append(data)
 
-def _process_comments(result, migrations):
+def _create_page(page, order: int, stable_ids: bool = False) -> dict:
+    created = format_datetime(page["post_date"])
+    return {
+        "_id": _new_object_id(stable_ids, "post", page["post_id"]),
+        "created": created,
+        "commentsIndex": 0,
+        "allowComment": page["comment_status"] == "open",
+        "title": page["title"],
+        "text": page["content"],
+        "images": [],
+        "modified": format_datetime(page["post_modified"]),
+        "slug": page["post_name"],
+        "subtitle": "",
+        "order": order,
+    }
+
+def _process_comments(
+    result,
+    migrations,
+    indexes,
+    workers: int = 1,
+    chunksize: int = 64,
+    cache: MarkdownCache = None,
+    stable_ids: bool = False
+):
     comment_ref_type_list = ['post', 'page']
+    _convert_comments(
+        [item for _type in comment_ref_type_list if _type in result["items"] for item in result["items"][_type]],
+        workers, chunksize, cache
+    )
+
     for _type in comment_ref_type_list:
         if _type in result["items"]:
             for item in result["items"][_type]:
-                ref_id = next((ref["_id"] for ref in migrations["posts" if _type == 'post' else 'pages'] if ref["slug"] == item["post_name"]), None)
+                ref_id = indexes[_type].get(item["post_id"])
+                if ref_id is None and item["comments"]:
+                    logger.warning("Comments of %s %s (%r) have no target", _type, item["post_id"], item["title"])
                 for comment in item["comments"]:
-                    comment["content"] = markdownify(comment["content"])
-                    comment["content"] = comment["content"].replace("\\", "")
-                    data = {
-                        "_id": ObjectId(),
-                        "ref": ref_id,
-                        "refType": "posts" if _type == 'post' else 'pages',
-                        "author": comment["author"],
-                        "mail": comment["author_email"],
-                        "url": comment["author_url"],
-                        "text": comment["content"],
-                        "state": 2 if comment["approved"] == "trash" else 1,
-                        "children": [],
-                        "commentIndex": 0,
-                        "key": "",
-                        "ip": comment["author_ip"],
-                        "agent": "",
-                        "pin": False,
-                        "isWhispers": False,
-                        "created": format_datetime(comment["date"]),
-                        "original": {
-                            "id": comment["id"],
-                            "parent_id": comment["parent"]
-                        }
-                    }
-                    migrations["comments"].append(data)
+                    migrations["comments"].append(_create_comment(comment, ref_id, _type, stable_ids))
+
+def _convert_comments(items: list, workers: int = 1, chunksize: int = 64, cache: MarkdownCache = None):
+    """
+    将 items 下所有评论的内容转换为 Markdown
+    """
+    comment_list = [comment for item in items for comment in item["comments"]]
+    contents = markdownify_many([comment["content"] for comment in comment_list], workers, chunksize, cache)
+    for comment, content in zip(comment_list, contents):
+        comment["content"] = content.replace("\\", "")
+
+def _create_comment(comment, ref_id: ObjectId, _type: str, stable_ids: bool = False) -> dict:
+    created = format_datetime(comment["date"])
+    return {
+        "_id": _new_object_id(stable_ids, "comment", comment["id"]),
+        "ref": ref_id,
+        "refType": "posts" if _type == 'post' else 'pages',
+        "author": comment["author"],
+        "mail": comment["author_email"],
+        "url": comment["author_url"],
+        "text": comment["content"],
+        "state": 2 if comment["approved"] == "trash" else 1,
+        "children": [],
+        "commentIndex": 0,
+        "key": "",
+        "ip": comment["author_ip"],
+        "agent": "",
+        "pin": False,
+        "isWhispers": False,
+        "created": created,
+        "original": {
+            "id": comment["id"],
+            "parent_id": comment["parent"]
+        }
+    }
 
 def _link_comments(migrations):
+    comments_by_id = {}
+    for comment in migrations["comments"]:
+        comments_by_id.setdefault(comment["original"]["id"], comment)
     for comment in migrations["comments"]:
         if comment["original"]["parent_id"] != "0":
-            parent_comment = next((pc for pc in migrations["comments"] if pc["original"]["id"] == comment["original"]["parent_id"]), None)
+            parent_comment = comments_by_id.get(comment["original"]["parent_id"])
             if parent_comment:
                 parent_comment["children"].append(comment["_id"])
                 comment['parent'] = parent_comment["_id"]
@@ -223,57 +666,71 @@ def _link_comments(migrations):
         comment.pop("original")
 
 def _assign_comment_keys(migrations):
+    """
+    按层级分配评论的 key，父评论总是先于子评论处理，因此与评论在导出文件中的顺序无关
+    """
+    refs = {item["_id"]: item for _type in ["posts", "pages"] for item in migrations[_type]}
+    comments = {comment["_id"]: comment for comment in migrations["comments"]}
+    queue = collections.deque()
     for comment in migrations["comments"]:
-        ref = migrations["posts"] if comment["refType"] == "posts" else migrations["pages"]
-        for item in ref:
-            if item["_id"] == comment["ref"]:
-                if "parent" not in comment:
-                    item["commentsIndex"] = item.get("commentsIndex", 0) + 1
-                    comment["commentIndex"] = item["commentsIndex"]
-                    comment["key"] = f"#{comment['commentIndex']}"
-                else:
-                    parent_comment = next((pc for pc in migrations["comments"] if pc["_id"] == comment["parent"]), None)
-                    if parent_comment:
-                        parent_comment["commentsIndex"] = parent_comment.get("commentsIndex", 0) + 1
-                        comment["commentIndex"] = parent_comment["commentsIndex"]
-                        comment["key"] = f"{parent_comment['key']}#{comment['commentIndex']}"
+        if "parent" not in comment:
+            item = refs.get(comment["ref"])
+            if item is not None:
+                item["commentsIndex"] = item.get("commentsIndex", 0) + 1
+                comment["commentIndex"] = item["commentsIndex"]
+                comment["key"] = f"#{comment['commentIndex']}"
+                queue.append(comment)
+    while queue:
+        parent_comment = queue.popleft()
+        for child_id in parent_comment["children"]:
+            comment = comments[child_id]
+            parent_comment["commentsIndex"] = parent_comment.get("commentsIndex", 0) + 1
+            comment["commentIndex"] = parent_comment["commentsIndex"]
+            comment["key"] = f"{parent_comment['key']}#{comment['commentIndex']}"
+            queue.append(comment)
 
 def _migrate_posts_to_notes(migrations, migrate_to_notes_func):
-    i = 0
+    """
+    一次遍历把文章分为文章与手记，nid 按文章在导出文件中的顺序从 1 开始编号，
+    再按手记 _id 集合一次遍历评论修改 refType
+    """
+    posts = []
+    note_ids = set()
     for post in migrations["posts"]:
         original = post.pop("original")
-        if migrate_to_notes_func and migrate_to_notes_func(original):
-            i += 1
-            data = {
-                "_id": post["_id"],
-                "created": post["created"],
-                "commentsIndex": 0,
-                "allowComment": post["allowComment"],
-                "title": post["title"],
-                "text": post["text"],
-                "images": [],
-                "modified": post["modified"],
-                "hide": original["password"] is not None,
-                "password": original["password"],
-                "publicAt": None,
-                "mood": "",
-                "weather": "",
-                "bookmark": False,
-                "coordinates": None,
-                "location": "",
-                "count": post["count"],
-                "nid": i
-            }
-            migrations["notes"].append(data)
-            for comment in migrations["comments"]:
-                if comment["ref"] == post["_id"]:
-                    comment["refType"] = "notes"
-
-def _remove_posts_existed_in_notes(migrations):
-    for note in migrations["notes"]:
-        for post in migrations["posts"]:
-            if note["_id"] == post["_id"]:
-                migrations["posts"].remove(post)
+        if not (migrate_to_notes_func and migrate_to_notes_func(original)):
+            posts.append(post)
+            continue
+        migrations["notes"].append(_create_note(post, original, len(migrations["notes"]) + 1))
+        note_ids.add(post["_id"])
+    migrations["posts"] = posts
+
+    if note_ids:
+        for comment in migrations["comments"]:
+            if comment["ref"] in note_ids:
+                comment["refType"] = "notes"
+
+def _create_note(post: dict, original: dict, nid: int) -> dict:
+    return {
+        "_id": post["_id"],
+        "created": post["created"],
+        "commentsIndex": 0,
+        "allowComment": post["allowComment"],
+        "title": post["title"],
+        "text": post["text"],
+        "images": [],
+        "modified": post["modified"],
+        "hide": original["password"] is not None,
+        "password": original["password"],
+        "publicAt": None,
+        "mood": "",
+        "weather": "",
+        "bookmark": False,
+        "coordinates": None,
+        "location": "",
+        "count": post["count"],
+        "nid": nid
+    }
 
 def _save_migrations_to_bson(migrations, output_dir):
     if not os.path.exists(output_dir):
@@ -281,4 +738,4 @@ def _save_migrations_to_bson(migrations, output_dir):
     for key, value in migrations.items():
         file_path = os.path.join(output_dir, f"{key}.bson")
         with open(file_path, "wb") as f:
-            f.write(json_array_to_bson(value))
\ No newline at end of file
+            write_bson(f, value)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import json
+import bson
+import hashlib
+import logging
+from bson import ObjectId
+from .wpconvert import write_bson
+
+logger = logging.getLogger(__name__)
+
+# 每次运行都会变化、不参与比较的字段
+VOLATILE_FIELDS = {
+    "categories": ("created",),
+}
+
+def document_hash(name: str, document: dict) -> str:
+    """
+    文档内容的摘要，忽略 VOLATILE_FIELDS 中的字段
+    """
+    volatile = VOLATILE_FIELDS.get(name, ())
+    if volatile:
+        document = {key: value for key, value in document.items() if key not in volatile}
+    return hashlib.sha1(bson.encode(document)).hexdigest()
+
+def load_delta_state(path: str) -> dict:
+    """
+    读取上一次运行保存的状态 {集合名: {_id: 内容摘要}}，文件不存在时返回空状态
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_delta_state(state: dict, path: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def compute_delta(migrations: dict, state: dict) -> tuple:
+    """
+    与上一次运行的状态比较，返回 (delta, new_state)
+    delta 为 {集合名: {"upsert": [新增或变化的文档], "delete": [已删除文档的 _id]}}
+    文章与页面的 modified（即 post_modified）包含在文档中，修改过的条目摘要必然不同
+    需要配合 convert_to_bson(stable_ids=True) 使用，否则每次运行的 _id 都不同，全部文档都会被视为变化
+    """
+    delta = {}
+    new_state = {}
+    for name, documents in migrations.items():
+        previous = state.get(name, {})
+        current = {}
+        upsert = []
+        for document in documents:
+            key = str(document["_id"])
+            digest = document_hash(name, document)
+            current[key] = digest
+            if previous.get(key) != digest:
+                upsert.append(document)
+        delete = [ObjectId(key) for key in previous if key not in current]
+        new_state[name] = current
+        delta[name] = {"upsert": upsert, "delete": delete}
+        logger.info("%s: %d upserted, %d deleted, %d unchanged", name, len(upsert), len(delete), len(current) - len(upsert))
+    return delta, new_state
+
+def save_delta_to_bson(delta: dict, output_dir: str):
+    """
+    将 delta 写为 {集合名}.upsert.bson 与 {集合名}.delete.bson（只含 _id），没有变化的集合不生成文件
+    写入前删除 output_dir 中上一次运行留下的 delta 文件，目录内容始终与本次的 delta 一致
+    """
+    if not os.path.exists(output_dir):
+        os.mkdir(output_dir)
+    for file_name in os.listdir(output_dir):
+        if file_name.endswith((".upsert.bson", ".delete.bson")):
+            os.remove(os.path.join(output_dir, file_name))
+    for name, changes in delta.items():
+        if changes["upsert"]:
+            with open(os.path.join(output_dir, f"{name}.upsert.bson"), "wb") as f:
+                write_bson(f, changes["upsert"])
+        if changes["delete"]:
+            with open(os.path.join(output_dir, f"{name}.delete.bson"), "wb") as f:
+                write_bson(f, ({"_id": _id} for _id in changes["delete"]))
+
+def delta_saver(
+    state_path: str,
+    output_dir: str = "output_delta",
+    apply_func: callable = None
+) -> callable:
+    """
+    返回可传给 convert_to_bson(save_func=...) 的增量写入函数
+    与 state_path 中上一次运行的状态比较，只输出新增、变化与删除的文档：
+    apply_func 不为空时以 delta 调用它（例如 apply_delta_to_mongo），否则写入 output_dir；
+    写入成功后才更新 state_path，失败时下次运行会重新输出同样的变化
+    """
+    def save(migrations):
+        delta, new_state = compute_delta(migrations, load_delta_state(state_path))
+        if apply_func is not None:
+            apply_func(delta)
+        else:
+            save_delta_to_bson(delta, output_dir)
+        save_delta_state(new_state, state_path)
+        return delta
+    return save
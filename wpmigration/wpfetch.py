@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import posixpath
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urljoin, urlsplit
+from .wpfile import _collect_upload_files
+
+logger = logging.getLogger(__name__)
+
+# 遇到这些状态码时重试，其余 4xx 直接视为失败
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+def remote_file_name(pic_url: str) -> str:
+    """
+    外部图片在 files 中的文件名：链接的短哈希加原文件名，不同站点的同名文件不会冲突
+    可在 migrate_pic_func 中用它把外部图片链接换成自己的文件链接，再由 fetch_images 下载
+    """
+    digest = hashlib.sha1(pic_url.encode("utf-8")).hexdigest()[:12]
+    file_name = unquote(posixpath.basename(urlsplit(pic_url).path))
+    file_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in file_name)
+    return f"{digest}_{file_name}" if file_name else digest
+
+def find_missing_images(images: dict, dir_path: str, rename_func: callable = None) -> dict:
+    """
+    找出被 migrate_pic_func 换成新链接、但 uploads 中没有对应文件的图片
+    images 为 convert_to_bson 得到的 media["images"] ({原链接: 替换后链接})，新链接的文件名即 files 中的文件名，
+    rename_func 同 move_files_and_rename，用于得到 uploads 中已有文件的新文件名
+    返回可传给 fetch_images 的 {文件名: 原链接}
+    """
+    local = set()
+    if os.path.exists(dir_path):
+        local = {new_file_name for _, new_file_name in _collect_upload_files(dir_path, rename_func)}
+
+    downloads = {}
+    for pic_url, new_pic_url in images.items():
+        if new_pic_url == pic_url:
+            continue
+        parts = urlsplit(pic_url.strip())
+        if parts.scheme not in ("http", "https", "") or not parts.netloc:
+            continue
+        file_name = _link_file_name(new_pic_url)
+        if not file_name or file_name in local:
+            continue
+        downloads.setdefault(file_name, pic_url.strip() if parts.scheme else "https:" + pic_url.strip())
+    logger.info("%d of %d image links have no local file", len(downloads), len(images))
+    return downloads
+
+def failed_image_links(images: dict, failed: dict) -> set:
+    """
+    根据 fetch_images(...)["failed"] 找出新链接指向下载失败文件的原链接
+    images 同 find_missing_images；再次转换时这些链接应保留原链接，否则会指向不存在的文件
+    """
+    return {pic_url for pic_url, new_pic_url in images.items() if new_pic_url != pic_url and _link_file_name(new_pic_url) in failed}
+
+def _link_file_name(new_pic_url: str) -> str:
+    return unquote(posixpath.basename(urlsplit(new_pic_url).path))
+
+def fetch_images(
+    downloads: dict,
+    download_dir: str = "remote_files",
+    state_path: str = None,
+    concurrency: int = 8,
+    per_host: int = 2,
+    host_rate: float = 4.0,
+    retries: int = 3,
+    backoff: float = 1.0,
+    timeout: float = 30.0,
+    user_agent: str = "wordpress-to-mxspace"
+) -> dict:
+    """
+    使用 asyncio 并发下载 {文件名: 链接} 到 download_dir
+    concurrency 为总并发数（同时也是连接池中线程数），per_host 为每个站点的并发连接数，
+    host_rate 为每个站点每秒最多发起的请求数；网络错误与 408/429/5xx 最多重试 retries 次，间隔按 backoff 指数增长，
+    429/503 带有 Retry-After 时按其等待
+    状态文件 (默认为 download_dir + ".state.json") 记录每个文件的下载结果，中断后重新运行只下载未完成的文件
+    返回 {"downloaded", "skipped", "failed": {文件名: 错误}, "files": {文件名: 本地路径}}，
+    files 可传给 sync_files_and_rename / move_files_and_rename 的 extra_files，与 uploads 中的图片一起放入目标目录
+    """
+    if state_path is None:
+        state_path = os.path.normpath(download_dir) + ".state.json"
+    os.makedirs(download_dir, exist_ok=True)
+
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    pending = {}
+    skipped = 0
+    for file_name, url in downloads.items():
+        entry = state.get(file_name)
+        if (
+            entry is not None and entry["status"] == "done" and entry["url"] == url
+            and os.path.exists(os.path.join(download_dir, file_name))
+        ):
+            skipped += 1
+            continue
+        pending[file_name] = url
+
+    start = time.perf_counter()
+    fetcher = _Fetcher(download_dir, state, state_path, concurrency, per_host, host_rate, retries, backoff, timeout, user_agent)
+    try:
+        asyncio.run(fetcher.run(pending))
+    finally:
+        fetcher.save_state()
+    elapsed = time.perf_counter() - start
+
+    failed = {
+        file_name: state[file_name]["error"]
+        for file_name in downloads if state.get(file_name, {}).get("status") == "failed"
+    }
+    files = {
+        file_name: os.path.join(download_dir, file_name)
+        for file_name in downloads if state.get(file_name, {}).get("status") == "done"
+    }
+    logger.info(
+        "Fetched %d images (%.1f MiB in %.2fs), %d already present, %d failed",
+        fetcher.downloaded, fetcher.downloaded_bytes / 1048576, elapsed, skipped, len(failed)
+    )
+    for file_name, error in list(failed.items())[:10]:
+        logger.warning("Failed to fetch %s: %s", downloads[file_name], error)
+    return {"downloaded": fetcher.downloaded, "skipped": skipped, "failed": failed, "files": files}
+
+class _FetchError(Exception):
+    def __init__(self, message: str, retry: bool = False, retry_after: float = None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+class _ConnectionPool:
+    """
+    按 (scheme, host) 复用 http.client 连接，供线程池中的下载任务使用
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme: str, netloc: str, reuse: bool = True):
+        """
+        返回 (连接, 是否为复用的空闲连接)
+        """
+        if reuse:
+            with self._lock:
+                connections = self._idle.get((scheme, netloc))
+                if connections:
+                    return connections.pop(), True
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def put(self, scheme: str, netloc: str, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+class _Fetcher:
+
+    def __init__(self, download_dir, state, state_path, concurrency, per_host, host_rate, retries, backoff, timeout, user_agent):
+        self.download_dir = download_dir
+        self.state = state
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.interval = 1.0 / host_rate if host_rate else 0.0
+        self.retries = retries
+        self.backoff = backoff
+        self.user_agent = user_agent
+        self.pool = _ConnectionPool(timeout)
+        self.downloaded = 0
+        self.downloaded_bytes = 0
+        self._hosts = {}
+        self._completed = 0
+
+    async def run(self, pending: dict):
+        if not pending:
+            return
+        self._limit = asyncio.Semaphore(self.concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            await asyncio.gather(*(
+                self._fetch(file_name, url, executor) for file_name, url in pending.items()
+            ))
+        finally:
+            executor.shutdown(wait=True)
+            self.pool.close()
+
+    async def _fetch(self, file_name: str, url: str, executor):
+        loop = asyncio.get_running_loop()
+        host = urlsplit(url).netloc
+        path = os.path.join(self.download_dir, file_name)
+        attempt = 0
+        while True:
+            async with self._host_slot(host), self._limit:
+                await self._wait_for_rate(host)
+                try:
+                    size = await loop.run_in_executor(executor, self._download, url, path)
+                    error = None
+                except _FetchError as e:
+                    error = e
+                except (OSError, http.client.HTTPException) as e:
+                    error = _FetchError(f"{type(e).__name__}: {e}", retry=True)
+            if error is None:
+                self.downloaded += 1
+                self.downloaded_bytes += size
+                self._record(file_name, {"url": url, "status": "done", "size": size, "attempts": attempt + 1})
+                return
+            if not error.retry or attempt >= self.retries:
+                self._record(file_name, {"url": url, "status": "failed", "error": str(error), "attempts": attempt + 1})
+                return
+            delay = error.retry_after if error.retry_after is not None else self.backoff * 2 ** attempt
+            attempt += 1
+            logger.debug("Retrying %s in %.1fs (attempt %d): %s", url, delay, attempt, error)
+            await asyncio.sleep(delay + random.uniform(0, self.backoff / 4))
+
+    def _host_slot(self, host: str):
+        if host not in self._hosts:
+            self._hosts[host] = {"semaphore": asyncio.Semaphore(self.per_host), "lock": asyncio.Lock(), "next": 0.0}
+        return self._hosts[host]["semaphore"]
+
+    async def _wait_for_rate(self, host: str):
+        """
+        保证同一站点相邻两次请求的间隔不小于 1 / host_rate 秒
+        """
+        limiter = self._hosts[host]
+        async with limiter["lock"]:
+            now = time.monotonic()
+            if limiter["next"] > now:
+                await asyncio.sleep(limiter["next"] - now)
+                now = limiter["next"]
+            limiter["next"] = now + self.interval
+
+    def _download(self, url: str, path: str) -> int:
+        """
+        在线程中执行：发起请求（跟随重定向）并将响应写入 path，返回文件大小
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            target = quote(parts.path or "/", safe="/%:@!$&'()*+,;=~") + (f"?{parts.query}" if parts.query else "")
+            connection, response = self._request(parts, target)
+
+            if response.status in REDIRECT_STATUS and response.getheader("Location"):
+                response.read()
+                self._release(parts, connection, response)
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            if response.status != 200:
+                response.read()
+                self._release(parts, connection, response)
+                retry_after = response.getheader("Retry-After")
+                raise _FetchError(
+                    f"HTTP {response.status} {response.reason}",
+                    retry=response.status in RETRY_STATUS,
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+
+            part_path = path + ".part"
+            size = 0
+            try:
+                with open(part_path, "wb") as f:
+                    for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                        f.write(chunk)
+                        size += len(chunk)
+            except BaseException:
+                connection.close()
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+            length = response.getheader("Content-Length")
+            self._release(parts, connection, response)
+            if length is not None and length.isdigit() and int(length) != size:
+                os.remove(part_path)
+                raise _FetchError(f"Incomplete download: {size} of {length} bytes", retry=True)
+            os.replace(part_path, path)
+            return size
+        raise _FetchError("Too many redirects")
+
+    def _request(self, parts, target: str):
+        headers = {"User-Agent": self.user_agent, "Accept": "image/*,*/*"}
+        connection, reused = self.pool.get(parts.scheme, parts.netloc)
+        try:
+            connection.request("GET", target, headers=headers)
+            return connection, connection.getresponse()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            if not reused:
+                raise
+        # 空闲连接可能已被服务器关闭，换新连接重试一次
+        connection, _ = self.pool.get(parts.scheme, parts.netloc, reuse=False)
+        try:
+            connection.request("GET", target, headers=headers)
+            return connection, connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    def _release(self, parts, connection, response):
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.put(parts.scheme, parts.netloc, connection)
+
+    def _record(self, file_name: str, entry: dict):
+        self.state[file_name] = entry
+        self._completed += 1
+        # 定期写出状态，进程被中断时最多重新下载最近的几十个文件
+        if self._completed % 50 == 0:
+            self.save_state()
+
+    def save_state(self):
+        tmp_state_path = self.state_path + ".tmp"
+        with open(tmp_state_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_state_path, self.state_path)
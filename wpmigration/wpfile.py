@@ -1,19 +1,285 @@
 import os
+import json
+import shutil
+import hashlib
+import logging
+import time
+import itertools
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Linux FICLONE ioctl，用于在支持的文件系统 (btrfs / xfs 等) 上创建 reflink
+FICLONE = 0x40049409
 
 def move_files_and_rename(
-    dir_path: str, 
-    target_dir_path: str, 
-    rename_func: callable = None
-):
+    dir_path: str,
+    target_dir_path: str,
+    rename_func: callable = None,
+    workers: int = 8,
+    mode: str = "copy",
+    only_files: set = None,
+    duplicates: dict = None,
+    extra_files: dict = None
+) -> dict:
+    """
+    扫描 WordPress uploads 目录，将原图按 rename_func 重命名后放入 target_dir_path
+    workers 为并行复制的线程数；mode 可选 copy / hardlink / reflink，
+    后两者要求源目录与目标目录在同一文件系统，失败时回退为内核态复制
+    only_files 为 uploads 下的相对路径集合（如 convert_to_bson 得到的 media["referenced"]）时只处理这些文件
+    duplicates 为 find_duplicate_files(...)["duplicates"] 时重复的文件只复制一份
+    extra_files 为 {新文件名: 源文件路径} 时一并放入目标目录，例如 fetch_images(...)["files"] 下载的图片
+    rename_func 把多个源文件映射到同一文件名时会报告冲突并保留第一个（同 sync_files_and_rename）
+    返回复制的文件数、字节数、耗时与冲突
+    """
     if not os.path.exists(dir_path):
         raise FileNotFoundError(f"{dir_path} not found.")
-    
+    if mode not in ("copy", "hardlink", "reflink"):
+        raise ValueError(f"Unknown transfer mode {mode!r}.")
+
     if os.path.exists(target_dir_path):
         for file_name in os.listdir(target_dir_path):
             os.remove(os.path.join(target_dir_path, file_name))
     else:
         os.mkdir(target_dir_path)
-        
+
+    planned, collisions = _plan_transfers(itertools.chain(
+        sorted(_collect_upload_files(dir_path, rename_func, only_files, duplicates)),
+        _collect_extra_files(extra_files)
+    ))
+    tasks = [(src, os.path.join(target_dir_path, new_file_name)) for new_file_name, src in planned.items()]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total_bytes = sum(executor.map(lambda task: _transfer_file(*task, mode), tasks))
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        "Transferred %d files, %.1f MiB in %.2fs (%.1f MiB/s), %d collisions",
+        len(tasks), total_bytes / 1048576, elapsed, total_bytes / 1048576 / elapsed if elapsed else 0, len(collisions)
+    )
+    return {"files": len(tasks), "bytes": total_bytes, "seconds": elapsed, "collisions": collisions}
+
+def sync_files_and_rename(
+    dir_path: str,
+    target_dir_path: str,
+    rename_func: callable = None,
+    manifest_path: str = None,
+    workers: int = 8,
+    mode: str = "copy",
+    only_files: set = None,
+    duplicates: dict = None,
+    extra_files: dict = None
+) -> dict:
+    """
+    增量同步版的 move_files_and_rename，不清空目标目录
+    清单文件 (默认为 target_dir_path + ".manifest.json") 记录每个目标文件的源路径、大小、修改时间与哈希，
+    只复制新增或变化的文件，只删除清单中记录、已没有对应源文件的目标文件（不在清单中的文件不会被删除），
+    rename_func 把多个源文件映射到同一文件名时会报告冲突并保留第一个，only_files / duplicates / extra_files 同 move_files_and_rename，
+    extra_files 与 uploads 中的文件重名时保留 uploads 中的文件
+    """
+    if not os.path.exists(dir_path):
+        raise FileNotFoundError(f"{dir_path} not found.")
+    if mode not in ("copy", "hardlink", "reflink"):
+        raise ValueError(f"Unknown transfer mode {mode!r}.")
+    if manifest_path is None:
+        manifest_path = os.path.normpath(target_dir_path) + ".manifest.json"
+    if not os.path.exists(target_dir_path):
+        os.mkdir(target_dir_path)
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    planned, collisions = _plan_transfers(itertools.chain(
+        sorted(_collect_upload_files(dir_path, rename_func, only_files, duplicates)),
+        _collect_extra_files(extra_files)
+    ))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda name: _sync_file(planned[name], os.path.join(target_dir_path, name), mode, manifest.get(name)),
+            planned
+        ))
+    elapsed = time.perf_counter() - start
+
+    new_manifest = {}
+    copied = copied_bytes = 0
+    for name, (entry, transferred) in zip(planned, results):
+        new_manifest[name] = entry
+        if transferred is not None:
+            copied += 1
+            copied_bytes += transferred
+
+    # 只删除上一次同步创建、这次已没有源文件的目标文件，目标目录中手动放入的文件保持不变
+    deleted = 0
+    for file_name in manifest:
+        if file_name in planned:
+            continue
+        path = os.path.join(target_dir_path, file_name)
+        if os.path.lexists(path):
+            os.remove(path)
+            deleted += 1
+
+    tmp_manifest_path = manifest_path + ".tmp"
+    with open(tmp_manifest_path, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_manifest_path, manifest_path)
+
+    logger.info(
+        "Synced %d files: %d copied (%.1f MiB in %.2fs), %d unchanged, %d orphans deleted, %d collisions",
+        len(planned), copied, copied_bytes / 1048576, elapsed, len(planned) - copied, deleted, len(collisions)
+    )
+    return {
+        "files": len(planned),
+        "copied": copied,
+        "bytes": copied_bytes,
+        "unchanged": len(planned) - copied,
+        "deleted": deleted,
+        "collisions": collisions,
+        "seconds": elapsed,
+    }
+
+def find_unmatched_links(images: dict, target_dir_path: str) -> dict:
+    """
+    检查被 migrate_pic_func 替换过的图片链接（convert_to_bson 得到的 media["images"]）：
+    新链接的文件名应当是 target_dir_path 中已复制的文件，否则链接与文件的命名规则不一致或文件缺失
+    返回没有对应文件的 {原链接: 新链接}
+    """
+    copied = set(os.listdir(target_dir_path)) if os.path.exists(target_dir_path) else set()
+    unmatched = {}
+    for pic_url, new_pic_url in images.items():
+        if new_pic_url == pic_url:
+            continue
+        file_name = unquote(posixpath.basename(urlsplit(new_pic_url).path))
+        if file_name not in copied:
+            unmatched[pic_url] = new_pic_url
+    if unmatched:
+        logger.warning(
+            "%d rewritten image links have no file in %s: %s", len(unmatched), target_dir_path,
+            ", ".join(f"{pic_url} -> {new_pic_url}" for pic_url, new_pic_url in list(unmatched.items())[:10])
+        )
+    return unmatched
+
+def find_duplicate_files(dir_path: str, workers: int = 8) -> dict:
+    """
+    找出 uploads 中内容完全相同的文件（跳过缩略图），只对大小相同的文件并行计算哈希
+    每组相同文件中相对路径排序最前的作为规范文件，其余记录到 duplicates: {重复文件相对路径: 规范文件相对路径}，
+    可传给 convert_to_bson 的 media["dedup"] 与 move_files_and_rename(duplicates=...)
+    """
+    if not os.path.exists(dir_path):
+        raise FileNotFoundError(f"{dir_path} not found.")
+
+    by_size = {}
+    for src, relative_path in _collect_upload_files(dir_path, lambda year, month, file_name: f"{year}/{month}/{file_name}"):
+        by_size.setdefault(os.path.getsize(src), []).append((relative_path, src))
+
+    candidates = [entry for entries in by_size.values() if len(entries) > 1 for entry in entries]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = list(executor.map(lambda entry: _hash_file(entry[1]), candidates))
+
+    groups = {}
+    for (relative_path, src), content_hash in zip(candidates, hashes):
+        groups.setdefault(content_hash, []).append((relative_path, src))
+
+    duplicates = {}
+    saved_bytes = 0
+    for entries in groups.values():
+        entries.sort()
+        canonical = entries[0][0]
+        for relative_path, src in entries[1:]:
+            duplicates[relative_path] = canonical
+            saved_bytes += os.path.getsize(src)
+
+    total_files = sum(len(entries) for entries in by_size.values())
+    logger.info(
+        "Found %d duplicate files among %d (%d hashed), %.1f MiB saved by deduplication",
+        len(duplicates), total_files, len(candidates), saved_bytes / 1048576
+    )
+    return {"duplicates": duplicates, "saved_bytes": saved_bytes, "files": total_files}
+
+def _plan_transfers(entries) -> tuple:
+    """
+    按顺序为 (源文件路径, 新文件名) 分配目标文件名，多个源文件对应同一文件名时保留第一个
+    返回 ({新文件名: 源文件路径}, {新文件名: [所有源文件路径]})
+    """
+    planned = {}
+    collisions = {}
+    for src, new_file_name in entries:
+        if new_file_name in planned:
+            collisions.setdefault(new_file_name, [planned[new_file_name]]).append(src)
+            continue
+        planned[new_file_name] = src
+    for new_file_name, sources in collisions.items():
+        logger.warning("Rename collision on %s, keeping %s: %s", new_file_name, sources[0], ", ".join(sources[1:]))
+    return planned, collisions
+
+def _sync_file(src: str, dst: str, mode: str, entry: dict = None):
+    """
+    根据清单记录判断是否需要复制，返回 (新的清单记录, 复制的字节数或 None)
+    """
+    stat = os.stat(src)
+    target_exists = os.path.exists(dst)
+    if entry is not None and target_exists and entry["source"] == src and entry["size"] == stat.st_size:
+        if entry["mtime"] == stat.st_mtime:
+            return entry, None
+        # 修改时间变化但内容未变，只更新清单
+        content_hash = _hash_file(src)
+        if content_hash == entry["hash"]:
+            return dict(entry, mtime=stat.st_mtime), None
+    else:
+        content_hash = _hash_file(src)
+
+    transferred = _transfer_file(src, dst, mode)
+    return {
+        "source": src,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "hash": content_hash,
+    }, transferred
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _collect_upload_files(
+    dir_path: str,
+    rename_func: callable = None,
+    only_files: set = None,
+    duplicates: dict = None
+):
+    """
+    遍历 uploads/year/month，跳过 WordPress 生成的缩略图，产出 (源文件路径, 新文件名)
+    给出 only_files 时不再遍历与按文件名判断缩略图，只产出其中存在的 year/month/file 文件
+    duplicates 中的重复文件（见 find_duplicate_files）会被跳过，只保留规范文件
+    """
+    if only_files is not None:
+        missing = []
+        for relative_path in sorted(only_files):
+            parts = relative_path.split("/")
+            src = os.path.join(dir_path, *parts)
+            if len(parts) != 3 or not os.path.isfile(src):
+                missing.append(relative_path)
+                continue
+            if duplicates and relative_path in duplicates:
+                continue
+            year_dir, month_dir, file_name = parts
+            if rename_func:
+                new_file_name = rename_func(year_dir, month_dir, file_name)
+            else:
+                new_file_name = f"{year_dir}_{month_dir}_{file_name}"
+            yield src, new_file_name
+        if missing:
+            logger.warning("%d referenced files are missing in %s: %s", len(missing), dir_path, ", ".join(missing[:10]))
+        return
+
     for year_dir in os.listdir(dir_path):
         try:
             year = int(year_dir.split("/")[-1])
@@ -26,13 +292,73 @@ def move_files_and_rename(
                     scale = file_name.split("-")[-1]
                     if scale == "scaled" or "x" in scale:
                         continue
+                if duplicates and f"{year_dir}/{month_dir}/{file_name}" in duplicates:
+                    continue
                 if rename_func:
                     new_file_name = rename_func(year_dir, month_dir, file_name)
                 else:
                     new_file_name = f"{year_dir}_{month_dir}_{file_name}"
-    
-                with open(os.path.join(dir_path, year_dir, month_dir, file_name), "rb") as f:
-                    with open(os.path.join(target_dir_path, new_file_name), "wb") as f2:
-                        f2.write(f.read())
-                        f2.close()
-                    f.close()
\ No newline at end of file
+
+                yield os.path.join(dir_path, year_dir, month_dir, file_name), new_file_name
+
+def _collect_extra_files(extra_files: dict = None):
+    """
+    产出 extra_files 中存在的 (源文件路径, 新文件名)
+    """
+    for new_file_name, src in sorted((extra_files or {}).items()):
+        if os.path.isfile(src):
+            yield src, new_file_name
+        else:
+            logger.warning("Extra file %s for %s is missing", src, new_file_name)
+
+def _transfer_file(src: str, dst: str, mode: str = "copy") -> int:
+    """
+    按 mode 传输单个文件，返回文件大小
+    已存在的目标文件先删除再写入：它可能是指向 uploads 中文件的硬链接，直接打开写入会改动源文件
+    """
+    size = os.path.getsize(src)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return size
+        except OSError:
+            pass
+    elif mode == "reflink":
+        try:
+            _reflink_file(src, dst)
+            return size
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+    _copy_file(src, dst, size)
+    return size
+
+def _reflink_file(src: str, dst: str):
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file(src: str, dst: str, size: int):
+    """
+    使用 copy_file_range 在内核态复制文件，不支持时回退到 shutil.copyfile（其内部会尝试 sendfile）
+    """
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(src, dst)
+        return
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        copied = 0
+        try:
+            while copied < size:
+                sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            # 跨文件系统或内核不支持时回退
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
@@ -0,0 +1,341 @@
+import re
+from html.parser import HTMLParser
+from importlib.metadata import version, PackageNotFoundError
+from bs4.dammit import EntitySubstitution
+from markdownify import markdownify, MarkdownConverter
+
+# 本模块逐条复刻了该版本 markdownify 的转换规则，安装的版本不同时全部交给 markdownify
+PORTED_MARKDOWNIFY_VERSION = "0.13.1"
+# 修改转换规则后递增，作为 Markdown 缓存键的一部分
+NATIVE_CONVERTER_VERSION = 1
+
+try:
+    NATIVE_ENABLED = version("markdownify") == PORTED_MARKDOWNIFY_VERSION
+except PackageNotFoundError:
+    NATIVE_ENABLED = False
+
+# 直接转换的标签，其余 markdownify 没有转换规则的标签（div、span、figure 等）只保留内容，与 markdownify 相同
+NATIVE_TAGS = {
+    "p", "a", "img", "br", "hr", "b", "strong", "i", "em", "del", "s", "sub", "sup", "code", "kbd", "samp", "pre",
+    "blockquote", "ul", "ol", "li", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+# markdownify 有转换规则但这里没有实现的标签（表格、script、style 等），遇到时整段交给 markdownify
+FALLBACK_TAGS = {
+    name[len("convert_"):] for name in dir(MarkdownConverter) if name.startswith("convert_")
+} - NATIVE_TAGS | {"thead", "tbody", "tfoot"}
+# markdownify 按 h 加数字匹配标题，h7、h1x 之类的标签同样交给 markdownify
+HEADING_LIKE_PATTERN = re.compile(r"h\d")
+
+# 以下与 bs4 (html.parser) 建树及 markdownify 的规则一致
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta", "param",
+    "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+NESTED_TAGS = {"ol", "ul", "li", "table", "thead", "tbody", "tfoot", "tr", "td", "th"}
+CODE_TAGS = {"pre", "code", "kbd", "samp"}
+BULLETS = "*+-"
+
+LINE_BEGINNING_PATTERN = re.compile(r"^", re.MULTILINE)
+WHITESPACE_PATTERN = re.compile(r"[\t ]+")
+ESCAPE_MISC_PATTERN = re.compile(r"([\\&<`[>~#=+|-])")
+ESCAPE_NUMBER_PATTERN = re.compile(r"([0-9])([.)])")
+
+def fast_markdownify(html: str) -> str:
+    """
+    将 HTML 转换为 Markdown，结果与 markdownify(html) 相同
+    用 html.parser 的分词器直接建立轻量的节点树并转换，省去 BeautifulSoup 的开销；
+    遇到 FALLBACK_TAGS 中的标签、CDATA / DOCTYPE 等声明或任何异常时改用 markdownify 转换整段内容
+    """
+    if not NATIVE_ENABLED or not isinstance(html, str):
+        return markdownify(html)
+    try:
+        root = _parse(html)
+        return _process_children(root, False, False, False, 0, False)
+    except Exception:
+        return markdownify(html)
+
+class _Unsupported(Exception):
+    pass
+
+class _Comment(str):
+    """
+    注释节点，与 bs4 相同不输出，但参与兄弟节点的判断
+    """
+    __slots__ = ()
+
+class _Element:
+    __slots__ = ("name", "attrs", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+
+class _TreeBuilder(HTMLParser):
+    """
+    按 bs4 的 html.parser 建树方式生成 _Element 树：
+    空白文本合并为一个空格或换行，空元素自动闭合，结束标签弹出到最近的同名标签
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.root = _Element("[document]", {})
+        self._stack = [self.root]
+        self._open = {}
+        self._preserve = 0
+        self._data = []
+        self._closed_void = []
+
+    def finish(self) -> _Element:
+        self.close()
+        self._end_data()
+        return self.root
+
+    def handle_starttag(self, name, attrs, void=True):
+        if name in FALLBACK_TAGS or (name not in NATIVE_TAGS and HEADING_LIKE_PATTERN.match(name)):
+            raise _Unsupported(name)
+        self._end_data()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = "" if value is None else value
+        element = _Element(name, attr_dict)
+        self._stack[-1].children.append(element)
+        self._stack.append(element)
+        self._open[name] = self._open.get(name, 0) + 1
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self._preserve += 1
+        if void and name in VOID_TAGS:
+            self._end_data()
+            self._pop_to(name)
+            self._closed_void.append(name)
+
+    def handle_startendtag(self, name, attrs):
+        self.handle_starttag(name, attrs, void=False)
+        self.handle_endtag(name)
+
+    def handle_endtag(self, name):
+        # 与 bs4 相同，<br> 之后的 </br> 或 <br/> 只抵消前一个自动闭合
+        if name in self._closed_void:
+            self._closed_void.remove(name)
+            return
+        self._end_data()
+        self._pop_to(name)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in "xX":
+            code = int(name.lstrip(name[0]), 16)
+        else:
+            code = int(name)
+        data = None
+        if code < 256:
+            try:
+                data = bytearray([code]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self._data.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._data.append(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._end_data()
+        self._data.append(data)
+        self._end_data(_Comment)
+
+    def handle_decl(self, data):
+        raise _Unsupported("declaration")
+
+    def unknown_decl(self, data):
+        raise _Unsupported("declaration")
+
+    def handle_pi(self, data):
+        raise _Unsupported("processing instruction")
+
+    def _end_data(self, kind=str):
+        if not self._data:
+            return
+        data = "".join(self._data)
+        self._data = []
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self._stack[-1].children.append(data if kind is str else kind(data))
+
+    def _pop_to(self, name: str):
+        if not self._open.get(name):
+            return
+        while len(self._stack) > 1:
+            element = self._stack.pop()
+            self._open[element.name] -= 1
+            if element.name in PRESERVE_WHITESPACE_TAGS:
+                self._preserve -= 1
+            if element.name == name:
+                return
+
+def _parse(html: str) -> _Element:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    return builder.finish()
+
+def _name(node) -> str:
+    return node.name if type(node) is _Element else None
+
+def _extract_whitespace(children: list):
+    """
+    同 markdownify：删除列表中位于首尾或与列表元素相邻的空白文本，
+    删除后跳过下一个节点（与在遍历中删除元素的行为一致）
+    """
+    index = 0
+    while index < len(children):
+        node = children[index]
+        if isinstance(node, str) and node.strip() == "":
+            previous_node = children[index - 1] if index > 0 else None
+            next_node = children[index + 1] if index + 1 < len(children) else None
+            if (
+                not previous_node or not next_node
+                or _name(previous_node) in NESTED_TAGS or _name(next_node) in NESTED_TAGS
+            ):
+                del children[index]
+        index += 1
+
+def _process_children(node: _Element, inline: bool, pre: bool, code: bool, ul_depth: int, in_li: bool) -> str:
+    """
+    转换 node 的所有子节点，pre / code / ul_depth / in_li 描述 node 本身及其祖先
+    """
+    children = node.children
+    parts = []
+    for index, child in enumerate(children):
+        child_type = type(child)
+        if child_type is str:
+            parts.append(_process_text(child, node, children, index, pre, code))
+        elif child_type is _Element:
+            parts.append(_process_tag(child, inline, node, children, index, pre, code, ul_depth, in_li))
+    return "".join(parts)
+
+def _process_text(text: str, parent: _Element, siblings: list, index: int, pre: bool, code: bool) -> str:
+    if not pre:
+        text = WHITESPACE_PATTERN.sub(" ", text)
+    if not code:
+        text = _escape(text)
+    if parent.name == "li":
+        next_node = siblings[index + 1] if index + 1 < len(siblings) else None
+        if not next_node or _name(next_node) in ("ul", "ol"):
+            text = text.rstrip()
+    return text
+
+def _escape(text: str) -> str:
+    if not text:
+        return ""
+    text = ESCAPE_MISC_PATTERN.sub(r"\\\1", text)
+    text = ESCAPE_NUMBER_PATTERN.sub(r"\1\\\2", text)
+    return text.replace("*", r"\*").replace("_", r"\_")
+
+def _process_tag(
+    el: _Element, inline: bool, parent: _Element, siblings: list, index: int,
+    pre: bool, code: bool, ul_depth: int, in_li: bool
+) -> str:
+    """
+    pre / code / ul_depth / in_li 描述 el 的祖先，对应 markdownify 中的 find_parent 查找
+    """
+    name = el.name
+    if name in NESTED_TAGS:
+        _extract_whitespace(el.children)
+    text = _process_children(
+        el, inline or name in ("h1", "h2", "h3", "h4", "h5", "h6"),
+        pre or name == "pre", code or name in CODE_TAGS, ul_depth + (name == "ul"), in_li or name == "li"
+    )
+    if name not in NATIVE_TAGS:
+        return text
+
+    if name == "p":
+        if inline:
+            return text
+        return f"{text}\n\n" if text else ""
+    if name == "a":
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ""
+        href = el.attrs.get("href")
+        title = el.attrs.get("title")
+        if text.replace(r"\_", "_") == href and not title:
+            return f"<{href}>"
+        title_part = ' "%s"' % title.replace('"', r"\"") if title else ""
+        return f"{prefix}[{text}]({href}{title_part}){suffix}" if href else text
+    if name == "img":
+        alt = el.attrs.get("alt") or ""
+        if inline:
+            return alt
+        src = el.attrs.get("src") or ""
+        title = el.attrs.get("title") or ""
+        title_part = ' "%s"' % title.replace('"', r"\"") if title else ""
+        return f"![{alt}]({src}{title_part})"
+    if name in ("strong", "b"):
+        return _inline(text, "**", code)
+    if name in ("em", "i"):
+        return _inline(text, "*", code)
+    if name == "br":
+        return "" if inline else "  \n"
+    if name == "li":
+        if parent.name == "ol":
+            start = parent.attrs.get("start")
+            bullet = "%s." % ((int(start) if start and start.isnumeric() else 1) + index)
+        else:
+            bullet = BULLETS[(ul_depth - 1) % len(BULLETS)]
+        return "%s %s\n" % (bullet, text.strip())
+    if name in ("ul", "ol"):
+        next_node = siblings[index + 1] if index + 1 < len(siblings) else None
+        if in_li:
+            return "\n" + _indent(text).rstrip()
+        return text + ("\n" if next_node and _name(next_node) not in ("ul", "ol") else "")
+    if name in ("h1", "h2", "h3", "h4", "h5", "h6"):
+        if inline:
+            return text
+        text = text.strip()
+        if name in ("h1", "h2"):
+            text = text.rstrip()
+            return "%s\n%s\n\n" % (text, ("=" if name == "h1" else "-") * len(text)) if text else ""
+        return "%s %s\n\n" % ("#" * int(name[1]), text)
+    if name in ("code", "kbd", "samp"):
+        if parent.name == "pre":
+            return text
+        return _inline(text, "`", code)
+    if name == "pre":
+        return "\n```\n%s\n```\n" % text if text else ""
+    if name == "blockquote":
+        if inline:
+            return text
+        return "\n" + (LINE_BEGINNING_PATTERN.sub("> ", text.strip()) + "\n\n") if text else ""
+    if name == "hr":
+        return "\n\n---\n\n"
+    if name in ("del", "s"):
+        return _inline(text, "~~", code)
+    if name in ("sub", "sup"):
+        return _inline(text, "", code)
+    # figcaption
+    return "\n\n" + text + "\n\n"
+
+def _chomp(text: str) -> tuple:
+    prefix = " " if text and text[0] == " " else ""
+    suffix = " " if text and text[-1] == " " else ""
+    return prefix, suffix, text.strip()
+
+def _inline(text: str, markup: str, code: bool) -> str:
+    if code:
+        return text
+    prefix, suffix, text = _chomp(text)
+    if not text:
+        return ""
+    return f"{prefix}{markup}{text}{markup}{suffix}"
+
+def _indent(text: str) -> str:
+    return LINE_BEGINNING_PATTERN.sub("\t", text) if text else ""
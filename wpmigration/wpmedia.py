@@ -0,0 +1,105 @@
+import posixpath
+from urllib.parse import quote, unquote, urlsplit
+
+def normalize_media_url(url: str) -> str:
+    """
+    统一图片链接的形式用于查找：解码百分号编码，去掉协议、查询参数与锚点
+    例如 https://a.com/wp-content/uploads/2024/10/a%20b.png?w=300 -> //a.com/wp-content/uploads/2024/10/a b.png
+    """
+    parts = urlsplit(url.strip())
+    return unquote(f"//{parts.netloc}{parts.path}")
+
+def build_attachment_index(attachments: list) -> dict:
+    """
+    根据 attachment 条目（guid、attached_file 与 attachment_metadata 中的尺寸）建立图片索引，
+    原图、-scaled 图以及各尺寸缩略图的链接都指向同一个原始文件
+    返回 {"files": {规范化链接: (uploads 链接前缀, uploads 下的相对路径)}, "bases": uploads 链接前缀集合}
+    """
+    files = {}
+    bases = set()
+    for attachment in attachments:
+        postmeta = attachment["postmeta"]
+        attached_file = postmeta.get("attached_file")
+        if not attached_file or not attachment.get("guid"):
+            continue
+        url = normalize_media_url(attachment["guid"])
+        if not url.endswith("/" + attached_file):
+            # guid 不是文件链接（例如 ?attachment_id=），无法推出 uploads 前缀
+            continue
+        base = url[:-len(attached_file)]
+        bases.add(base)
+
+        directory = posixpath.dirname(attached_file)
+        metadata = postmeta.get("attachment_metadata")
+        if not isinstance(metadata, dict):
+            metadata = {}
+        # WordPress 5.3 起大图的 attached_file 为 -scaled 版本，original_image 为上传的原图
+        canonical = attached_file
+        if metadata.get("original_image"):
+            canonical = posixpath.join(directory, metadata["original_image"])
+
+        names = {attached_file, canonical}
+        sizes = metadata.get("sizes")
+        if isinstance(sizes, dict):
+            names.update(
+                posixpath.join(directory, size["file"])
+                for size in sizes.values() if isinstance(size, dict) and size.get("file")
+            )
+        for name in names:
+            files.setdefault(base + name, (base, canonical))
+
+    return {"files": files, "bases": bases}
+
+def attachment_pic_func(media: dict, migrate_pic_func: callable = None) -> callable:
+    """
+    返回在 migrate_pic_func 之前先查询附件索引的图片链接替换函数
+    索引中的链接（包括缩略图）先换成原图链接再交给 migrate_pic_func，并记录到 media["referenced"]；
+    位于 uploads 下但不在索引中的链接记录到 media["dangling"]
+    media["dedup"] 为 find_duplicate_files(...) 的结果时，重复文件的链接（包括没有附件记录的）统一指向其规范文件
+    换成的原图链接记录到 media["canonical"] ({原图链接: uploads 下的相对路径})，migrate_pic_func 可据此直接得到文件名
+    交给 migrate_pic_func 的链接及其结果记录到 media["images"]，供 find_missing_images 查找需要下载的图片
+    """
+    files = media["index"]["files"]
+    bases = media["index"]["bases"]
+    duplicates = media["dedup"]["duplicates"] if media.get("dedup") else {}
+    images = media.setdefault("images", {})
+    media.setdefault("canonical", {})
+
+    def migrate(pic_url):
+        if pic_url not in images:
+            images[pic_url] = migrate_pic_func(pic_url)
+        return images[pic_url]
+
+    def rewrite(pic_url):
+        key = normalize_media_url(pic_url)
+        entry = files.get(key)
+        if entry is None:
+            base = next((base for base in bases if key.startswith(base)), None)
+            if base is None:
+                return migrate(pic_url) if migrate_pic_func else pic_url
+            media["dangling"].add(pic_url)
+            # 没有附件记录的 uploads 链接指向重复文件时同样改为规范文件，否则该文件不会被复制
+            relative_path = key[len(base):]
+            if relative_path not in duplicates:
+                return migrate(pic_url) if migrate_pic_func else pic_url
+            entry = (base, relative_path)
+
+        base, canonical = entry
+        canonical = duplicates.get(canonical, canonical)
+        media["referenced"].add(canonical)
+        if migrate_pic_func is None and canonical == entry[1]:
+            return pic_url
+        canonical_url = _canonical_url(pic_url, base, canonical)
+        media["canonical"][canonical_url] = canonical
+        return migrate(canonical_url) if migrate_pic_func else canonical_url
+
+    return rewrite
+
+def _canonical_url(pic_url: str, base: str, canonical: str) -> str:
+    """
+    由 uploads 链接前缀（//站点/路径/）与相对路径拼出原图链接，沿用 pic_url 的协议，只对路径部分进行百分号编码
+    """
+    parts = urlsplit(base)
+    canonical_url = f"//{parts.netloc}{quote(parts.path + canonical)}"
+    scheme = urlsplit(pic_url.strip()).scheme
+    return f"{scheme}:{canonical_url}" if scheme else canonical_url
@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+def save_migrations_to_mongo(
+    migrations: dict,
+    uri: str = "mongodb://localhost:27017",
+    database: str = "mx-space",
+    batch_size: int = 1000,
+    max_pool_size: int = 8,
+    upsert: bool = False
+) -> dict:
+    """
+    将迁移结果直接批量写入 MongoDB，代替生成 bson 文件后手动替换备份
+    每个集合按 batch_size 分批，使用 max_pool_size 个连接并发执行无序写入，同时最多有 2 * max_pool_size 个批次在等待写入；
+    upsert 为 True 时按 _id 覆盖已有文档，可重复执行，否则使用 insert_many
+    返回每个集合写入的文档数
+    """
+    from pymongo import MongoClient, ReplaceOne
+
+    client = MongoClient(uri, maxPoolSize=max_pool_size)
+    db = client[database]
+    counts = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_pool_size) as executor:
+            for name, documents in migrations.items():
+                start = time.perf_counter()
+                collection = db[name]
+                if upsert:
+                    def write(batch, collection=collection):
+                        collection.bulk_write(
+                            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                            ordered=False
+                        )
+                        return len(batch)
+                else:
+                    def write(batch, collection=collection):
+                        collection.insert_many(batch, ordered=False)
+                        return len(batch)
+                counts[name] = sum(_map_bounded(executor, write, _batched(documents, batch_size), 2 * max_pool_size))
+                logger.info("Wrote %d documents to %s.%s in %.2fs", counts[name], database, name, time.perf_counter() - start)
+    finally:
+        client.close()
+    return counts
+
+def mongo_saver(
+    uri: str = "mongodb://localhost:27017",
+    database: str = "mx-space",
+    batch_size: int = 1000,
+    max_pool_size: int = 8,
+    upsert: bool = False
+) -> callable:
+    """
+    返回可传给 convert_to_bson(save_func=...) 的写入函数，参数同 save_migrations_to_mongo
+    """
+    def save(migrations):
+        return save_migrations_to_mongo(migrations, uri, database, batch_size, max_pool_size, upsert)
+    return save
+
+def apply_delta_to_mongo(
+    delta: dict,
+    uri: str = "mongodb://localhost:27017",
+    database: str = "mx-space",
+    batch_size: int = 1000,
+    max_pool_size: int = 8
+) -> dict:
+    """
+    将 compute_delta(...) 的结果写入 MongoDB：新增与变化的文档按 _id 覆盖写入，已删除的文档按 _id 删除
+    返回每个集合 {"upserted": 写入数, "deleted": 删除数}
+    """
+    from pymongo import MongoClient, ReplaceOne, DeleteOne
+
+    client = MongoClient(uri, maxPoolSize=max_pool_size)
+    db = client[database]
+    counts = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_pool_size) as executor:
+            for name, changes in delta.items():
+                start = time.perf_counter()
+                collection = db[name]
+
+                def write(requests, collection=collection):
+                    collection.bulk_write(requests, ordered=False)
+                    return len(requests)
+
+                upserts = (ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in changes["upsert"])
+                deletes = (DeleteOne({"_id": _id}) for _id in changes["delete"])
+                counts[name] = {
+                    "upserted": sum(_map_bounded(executor, write, _batched(upserts, batch_size), 2 * max_pool_size)),
+                    "deleted": sum(_map_bounded(executor, write, _batched(deletes, batch_size), 2 * max_pool_size)),
+                }
+                if counts[name]["upserted"] or counts[name]["deleted"]:
+                    logger.info(
+                        "Upserted %d and deleted %d documents in %s.%s in %.2fs",
+                        counts[name]["upserted"], counts[name]["deleted"], database, name, time.perf_counter() - start
+                    )
+    finally:
+        client.close()
+    return counts
+
+def _map_bounded(executor: ThreadPoolExecutor, func: callable, batches, limit: int):
+    """
+    同 executor.map，但最多只提交 limit 个未完成的任务，按需从 batches 中取出下一批，内存中只保留这些批次
+    """
+    pending = deque()
+    for batch in batches:
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, batch))
+    while pending:
+        yield pending.popleft().result()
+
+def _batched(documents, batch_size: int):
+    documents = iter(documents)
+    while True:
+        batch = list(islice(documents, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -4,6 +4,10 @@ try:
 except ImportError:
     from io import BytesIO as StringIO
 
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 try:
     import xml.etree.cElementTree as ET
 except ImportError:
@@ -17,6 +21,198 @@ WFW_NAMESPACE = "http://wellformedweb.org/CommentAPI/"
 DC_NAMESPACE = "http://purl.org/dc/elements/1.1/"
 WP_NAMESPACE = "http://wordpress.org/export/1.2/"
 
+# Paths of the plain text fields of an <item>.
+ITEM_PATHS = {
+    "title": "./title",
+    "link": "./link",
+    "pub_date": "./pubDate",
+    "creator": "./{%s}creator" % DC_NAMESPACE,
+    "guid": "./guid",
+    "description": "./description",
+    "content": "./{%s}encoded" % CONTENT_NAMESPACE,
+    "excerpt": "./{%s}encoded" % EXCERPT_NAMESPACE,
+    "post_id": "./{%s}post_id" % WP_NAMESPACE,
+    "post_date": "./{%s}post_date" % WP_NAMESPACE,
+    "post_date_gmt": "./{%s}post_date_gmt" % WP_NAMESPACE,
+    "post_modified": "./{%s}post_modified" % WP_NAMESPACE,
+    "post_modified_gmt": "./{%s}post_modified_gmt" % WP_NAMESPACE,
+    "status": "./{%s}status" % WP_NAMESPACE,
+    "post_parent": "./{%s}post_parent" % WP_NAMESPACE,
+    "menu_order": "./{%s}menu_order" % WP_NAMESPACE,
+    "post_type": "./{%s}post_type" % WP_NAMESPACE,
+    "post_name": "./{%s}post_name" % WP_NAMESPACE,
+    "is_sticky": "./{%s}is_sticky" % WP_NAMESPACE,
+    "comment_status": "./{%s}comment_status" % WP_NAMESPACE,
+    "ping_status": "./{%s}ping_status" % WP_NAMESPACE,
+    "post_password": "./{%s}post_password" % WP_NAMESPACE,
+}
+
+COMMENT_PATHS = {
+    "id": "./{%s}comment_id" % WP_NAMESPACE,
+    "author": "./{%s}comment_author" % WP_NAMESPACE,
+    "author_email": "./{%s}comment_author_email" % WP_NAMESPACE,
+    "author_url": "./{%s}comment_author_url" % WP_NAMESPACE,
+    "author_ip": "./{%s}comment_author_IP" % WP_NAMESPACE,
+    "date": "./{%s}comment_date" % WP_NAMESPACE,
+    "date_gmt": "./{%s}comment_date_gmt" % WP_NAMESPACE,
+    "content": "./{%s}comment_content" % WP_NAMESPACE,
+    "approved": "./{%s}comment_approved" % WP_NAMESPACE,
+    "type": "./{%s}comment_type" % WP_NAMESPACE,
+    "parent": "./{%s}comment_parent" % WP_NAMESPACE,
+    "user_id": "./{%s}comment_user_id" % WP_NAMESPACE,
+}
+
+# Meta keys that are stored under a different name.
+POSTMETA_NAMES = {
+    "_wp_attachment_metadata": "attachment_metadata",
+    "_wp_attached_file": "attached_file",
+}
+
+
+class WPRecord(MutableMapping):
+    """
+    Slotted record with dict-style access, returned by wpparse(records=True)
+    in place of the per-item dicts. Fields left out by a projection are
+    absent, as if the key was missing from the dict.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % item for item in self.items()))
+
+
+class WPItem(WPRecord):
+    __slots__ = (
+        "title", "link", "pub_date", "creator", "guid", "description",
+        "content", "excerpt", "post_id", "post_date", "post_date_gmt",
+        "post_modified", "post_modified_gmt", "status", "post_parent",
+        "menu_order", "post_type", "post_name", "categories", "is_sticky",
+        "comment_status", "ping_status", "post_password", "tags",
+        "custom_fields", "postmeta", "comments",
+    )
+
+
+class WPComment(WPRecord):
+    __slots__ = tuple(COMMENT_PATHS)
+
+
+class _Serialized(object):
+    """
+    A PHP serialized meta value that has not been decoded yet.
+    """
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class WPPostmeta(MutableMapping):
+    """
+    Post metadata mapping. The keys read by the converter live in slots,
+    anything else goes to a dict that is only created when needed.
+
+    Serialized values are decoded on first access and the result is cached.
+    A value that fails to decode is dropped, like the eager parser does.
+    """
+
+    KEYS = ("attached_file", "attachment_metadata", "views", "love",
+            "_tablepress_export_table_id")
+    __slots__ = KEYS + ("_extra",)
+
+    def __init__(self, **values):
+        self._extra = None
+        for key, value in values.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        value = self._get_raw(key)
+        if type(value) is _Serialized:
+            try:
+                value = _unserialize(value.raw)
+            except ValueError:
+                del self[key]
+                raise KeyError(key) from None
+            self[key] = value
+        return value
+
+    def _get_raw(self, key):
+        if key in self.KEYS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.KEYS:
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.KEYS:
+            try:
+                delattr(self, key)
+                return
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        keys = [key for key in self.KEYS if hasattr(self, key)]
+        if self._extra is not None:
+            keys.extend(self._extra)
+        for key in keys:
+            if type(self._get_raw(key)) is _Serialized and key not in self:
+                continue
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "WPPostmeta(%r)" % dict(self)
+
+
 def _parse_blog(element):
     """
     Parse and return genral blog data (title, tagline etc).
@@ -46,24 +242,32 @@ def _parse_authors(element):
     items = element.findall("./{%s}author" % WP_NAMESPACE)
 
     for item in items:
-        login = item.find("./{%s}author_login" % WP_NAMESPACE).text
-        email = item.find("./{%s}author_email" % WP_NAMESPACE).text
-        first_name = item.find("./{%s}author_first_name" % WP_NAMESPACE).text
-        last_name = item.find("./{%s}author_last_name" % WP_NAMESPACE).text
-        display_name = item.find(
-            "./{%s}author_display_name" % WP_NAMESPACE).text
-
-        authors.append({
-            "login": login,
-            "email": email,
-            "display_name": display_name,
-            "first_name": first_name,
-            "last_name": last_name
-        })
+        authors.append(_parse_author(item))
 
     return authors
 
 
+def _parse_author(item):
+    """
+    Parse a single <wp:author> element.
+    """
+
+    login = item.find("./{%s}author_login" % WP_NAMESPACE).text
+    email = item.find("./{%s}author_email" % WP_NAMESPACE).text
+    first_name = item.find("./{%s}author_first_name" % WP_NAMESPACE).text
+    last_name = item.find("./{%s}author_last_name" % WP_NAMESPACE).text
+    display_name = item.find(
+        "./{%s}author_display_name" % WP_NAMESPACE).text
+
+    return {
+        "login": login,
+        "email": email,
+        "display_name": display_name,
+        "first_name": first_name,
+        "last_name": last_name
+    }
+
+
 def _parse_categories(element):
     """
     Returns a list with categories with relations.
@@ -72,23 +276,30 @@ def _parse_categories(element):
     items = element.findall("./{%s}category" % WP_NAMESPACE)
 
     for item in items:
-        term_id = item.find("./{%s}term_id" % WP_NAMESPACE).text
-        nicename = item.find("./{%s}category_nicename" % WP_NAMESPACE).text
-        name = item.find("./{%s}cat_name" % WP_NAMESPACE).text
-        parent = item.find("./{%s}category_parent" % WP_NAMESPACE).text
-
-        category = {
-            "term_id": term_id,
-            "nicename": nicename,
-            "name": name,
-            "parent": parent
-        }
-
-        reference[nicename] = category
+        category = _parse_category(item)
+        reference[category["nicename"]] = category
 
     return _build_category_tree(None, reference=reference)
 
 
+def _parse_category(item):
+    """
+    Parse a single <wp:category> element.
+    """
+
+    term_id = item.find("./{%s}term_id" % WP_NAMESPACE).text
+    nicename = item.find("./{%s}category_nicename" % WP_NAMESPACE).text
+    name = item.find("./{%s}cat_name" % WP_NAMESPACE).text
+    parent = item.find("./{%s}category_parent" % WP_NAMESPACE).text
+
+    return {
+        "term_id": term_id,
+        "nicename": nicename,
+        "name": name,
+        "parent": parent
+    }
+
+
 def _build_category_tree(slug, reference=None, items=None):
     """
     Builds a recursive tree with category relations as children.
@@ -123,178 +334,243 @@ def _parse_tags(element):
     items = element.findall("./{%s}tag" % WP_NAMESPACE)
 
     for item in items:
-        term_id = item.find("./{%s}term_id" % WP_NAMESPACE).text
-        slug = item.find("./{%s}tag_slug" % WP_NAMESPACE).text
-        name = item.find("./{%s}tag_name" % WP_NAMESPACE).text
-
-        tag = {
-            "term_id": term_id,
-            "slug": slug,
-            "name": name,
-        }
-
-        tags.append(tag)
+        tags.append(_parse_tag(item))
 
     return tags
 
 
-def _parse_items(element):
+def _parse_tag(item):
+    """
+    Parse a single <wp:tag> element.
+    """
+
+    term_id = item.find("./{%s}term_id" % WP_NAMESPACE).text
+    slug = item.find("./{%s}tag_slug" % WP_NAMESPACE).text
+    name = item.find("./{%s}tag_name" % WP_NAMESPACE).text
+
+    return {
+        "term_id": term_id,
+        "slug": slug,
+        "name": name,
+    }
+
+
+def _parse_items(element, records=False, projection=None):
     """
     Returns a list with posts.
     """
 
-    posts = []
-    items = element.findall("item")
+    return [_parse_item(item, records, projection) for item in element.findall("item")]
 
-    for item in items:
-        title = item.find("./title").text
-        link = item.find("./link").text
-        pub_date = item.find("./pubDate").text
-        creator = item.find("./{%s}creator" % DC_NAMESPACE).text
-        guid = item.find("./guid").text
-        description = item.find("./description").text
-        content = item.find("./{%s}encoded" % CONTENT_NAMESPACE).text
-        excerpt = item.find("./{%s}encoded" % EXCERPT_NAMESPACE).text
-        post_id = item.find("./{%s}post_id" % WP_NAMESPACE).text
-        post_date = item.find("./{%s}post_date" % WP_NAMESPACE).text
-        post_date_gmt = item.find("./{%s}post_date_gmt" % WP_NAMESPACE).text
-        post_modified = item.find("./{%s}post_modified" % WP_NAMESPACE).text
-        post_modified_gmt = item.find(
-            "./{%s}post_modified_gmt" % WP_NAMESPACE).text
-        status = item.find("./{%s}status" % WP_NAMESPACE).text
-        post_parent = item.find("./{%s}post_parent" % WP_NAMESPACE).text
-        menu_order = item.find("./{%s}menu_order" % WP_NAMESPACE).text
-        post_type = item.find("./{%s}post_type" % WP_NAMESPACE).text
-        post_name = item.find("./{%s}post_name" % WP_NAMESPACE).text
-        is_sticky = item.find("./{%s}is_sticky" % WP_NAMESPACE).text
-        comment_status = item.find("./{%s}comment_status" % WP_NAMESPACE).text
-        ping_status = item.find("./{%s}ping_status" % WP_NAMESPACE).text
-        post_password = item.find("./{%s}post_password" % WP_NAMESPACE).text
-        category_items = item.findall("./category")
-
-        categories = []
-        tags = []
-        custom_fields = {}
-
-        for category_item in category_items:
-            if category_item.attrib["domain"] == "category":
-                categories.append(category_item.attrib["nicename"])
-            elif category_item.attrib["domain"] == "post_tag":
-                tags.append(category_item.attrib["nicename"])
-            else:
-                custom_fields[category_item.attrib["domain"]] = category_item.attrib["nicename"]
-
-        post = {
-            "title": title,
-            "link": link,
-            "pub_date": pub_date,
-            "creator": creator,
-            "guid": guid,
-            "description": description,
-            "content": content,
-            "excerpt": excerpt,
-            "post_id": post_id,
-            "post_date": post_date,
-            "post_date_gmt": post_date_gmt,
-            "post_modified": post_modified,
-            "post_modified_gmt": post_modified_gmt,
-            "status": status,
-            "post_parent": post_parent,
-            "menu_order": menu_order,
-            "post_type": post_type,
-            "post_name": post_name,
-            "categories": categories,
-            "is_sticky": is_sticky,
-            "comment_status": comment_status,
-            "ping_status": ping_status,
-            "post_password": post_password,
-            "tags": tags,
-            "custom_fields": custom_fields,
-        }
 
-        post["postmeta"] = _parse_postmeta(item)
-        post["comments"] = _parse_comments(item)
-        posts.append(post)
+def _parse_item(item, records=False, projection=None):
+    """
+    Parse a single <item> element (post, page, attachment etc).
+    """
+
+    fields = _projected_fields(projection, "item")
+    if fields is not None:
+        # Needed to group the items by type.
+        fields = fields | {"post_type"}
+    values = {}
+    terms = None
 
-    return posts
+    for name in WPItem.__slots__:
+        if fields is not None and name not in fields:
+            continue
 
+        if name in ITEM_PATHS:
+            values[name] = item.find(ITEM_PATHS[name]).text
+        elif name in ("categories", "tags", "custom_fields"):
+            if terms is None:
+                terms = _parse_terms(item)
+            values[name] = terms[name]
+        elif name == "postmeta":
+            values[name] = _parse_postmeta(item, records, projection)
+        elif name == "comments":
+            values[name] = _parse_comments(item, records, projection)
+
+    return WPItem(**values) if records else values
 
-def _parse_postmeta(element):
-    import phpserialize
 
+def _parse_terms(item):
+    """
+    Split the <category> elements of an item into categories, tags and
+    custom fields (post_format etc).
+    """
+
+    categories = []
+    tags = []
+    custom_fields = {}
+
+    for category_item in item.findall("./category"):
+        if category_item.attrib["domain"] == "category":
+            categories.append(category_item.attrib["nicename"])
+        elif category_item.attrib["domain"] == "post_tag":
+            tags.append(category_item.attrib["nicename"])
+        else:
+            custom_fields[category_item.attrib["domain"]] = category_item.attrib["nicename"]
+
+    return {
+        "categories": categories,
+        "tags": tags,
+        "custom_fields": custom_fields,
+    }
+
+
+def _parse_postmeta(element, records=False, projection=None):
     """
     Retrive post metadata as a dictionary
+
+    With records=True a WPPostmeta is returned that keeps the serialized
+    _wp_attachment_metadata and only unserializes it on first access.
     """
 
-    metadata = {}
+    keys = _projected_fields(projection, "postmeta")
+    metadata = WPPostmeta() if records else {}
     fields = element.findall("./{%s}postmeta" % WP_NAMESPACE)
 
     for field in fields:
         key = field.find("./{%s}meta_key" % WP_NAMESPACE).text
+        name = POSTMETA_NAMES.get(key, key)
+        if keys is not None and name not in keys:
+            continue
+
         value = field.find("./{%s}meta_value" % WP_NAMESPACE).text
 
         if key == "_wp_attachment_metadata":
-            stream = StringIO(value.encode())
+            if records:
+                metadata[name] = _Serialized(value)
+                continue
             try:
-                data = phpserialize.load(stream)
-                metadata["attachment_metadata"] = data
+                metadata[name] = _unserialize(value)
             except ValueError as e:
                 pass
-            except Exception as e:
-                raise(e)
-
-        elif key == "_wp_attached_file":
-            metadata["attached_file"] = value
 
         else:
-            metadata[key] = value
+            metadata[name] = value
 
     return metadata
 
 
-def _parse_comments(element):
+def _unserialize(value):
+    """
+    Unserialize a PHP serialized meta value. Keys and strings are decoded
+    to str here so the result can be serialized as is, without another
+    pass over the tree. Raises ValueError for malformed data.
+    """
+    import phpserialize
+
+    return phpserialize.load(
+        StringIO(value.encode()), decode_strings=True,
+        array_hook=lambda pairs: {str(k): v for k, v in pairs})
+
+
+def _parse_comments(element, records=False, projection=None):
     """
     Returns a list with comments.
     """
 
+    fields = _projected_fields(projection, "comment")
     comments = []
     items = element.findall("./{%s}comment" % WP_NAMESPACE)
 
     for item in items:
-        comment_id = item.find("./{%s}comment_id" % WP_NAMESPACE).text
-        author = item.find("./{%s}comment_author" % WP_NAMESPACE).text
-        email = item.find("./{%s}comment_author_email" % WP_NAMESPACE).text
-        author_url = item.find("./{%s}comment_author_url" % WP_NAMESPACE).text
-        author_ip = item.find("./{%s}comment_author_IP" % WP_NAMESPACE).text
-        date = item.find("./{%s}comment_date" % WP_NAMESPACE).text
-        date_gmt = item.find("./{%s}comment_date_gmt" % WP_NAMESPACE).text
-        content = item.find("./{%s}comment_content" % WP_NAMESPACE).text
-        approved = item.find("./{%s}comment_approved" % WP_NAMESPACE).text
-        comment_type = item.find("./{%s}comment_type" % WP_NAMESPACE).text
-        parent = item.find("./{%s}comment_parent" % WP_NAMESPACE).text
-        user_id = item.find("./{%s}comment_user_id" % WP_NAMESPACE).text
-
         comment = {
-            "id": comment_id,
-            "author": author,
-            "author_email": email,
-            "author_url": author_url,
-            "author_ip": author_ip,
-            "date": date,
-            "date_gmt": date_gmt,
-            "content": content,
-            "approved": approved,
-            "type": comment_type,
-            "parent": parent,
-            "user_id": user_id,
+            name: item.find(path).text
+            for name, path in COMMENT_PATHS.items()
+            if fields is None or name in fields
         }
-
-        comments.append(comment)
+        comments.append(WPComment(**comment) if records else comment)
 
     return comments
 
 
-def wpparse(path):
+def _projected_fields(projection, kind):
+    if projection is None or projection.get(kind) is None:
+        return None
+    return frozenset(projection[kind])
+
+
+def wpiterparse(path, records=False, projection=None):
+    """
+    Incrementally parse a WordPress export with iterparse.
+
+    Yields ``(kind, data)`` tuples where kind is one of "blog", "author",
+    "category", "tag" or "item". Every element is cleared once it has been
+    parsed, so memory stays bounded by the largest single item instead of
+    the whole file. Categories are yielded flat; use wpparse(stream=True)
+    to get the same tree as the non-streaming parser.
+
+    records and projection are passed through as in wpparse.
+    """
+
+    blog_fields = {
+        "title": "title",
+        "description": "tagline",
+        "language": "language",
+        "{%s}base_site_url" % WP_NAMESPACE: "site_url",
+        "{%s}base_blog_url" % WP_NAMESPACE: "blog_url",
+    }
+    element_parsers = {
+        "item": ("item", partial(_parse_item, records=records, projection=projection)),
+        "{%s}author" % WP_NAMESPACE: ("author", _parse_author),
+        "{%s}category" % WP_NAMESPACE: ("category", _parse_category),
+        "{%s}tag" % WP_NAMESPACE: ("tag", _parse_tag),
+    }
+
+    blog = dict.fromkeys(blog_fields.values())
+    blog_yielded = False
+    channel = None
+    depth = 0
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 2 and elem.tag == "channel":
+                channel = elem
+            continue
+
+        depth -= 1
+        if depth != 2 or channel is None:
+            continue
+
+        # Direct child of <channel> is complete.
+        if elem.tag in blog_fields:
+            blog[blog_fields[elem.tag]] = elem.text
+        elif elem.tag in element_parsers:
+            if not blog_yielded:
+                blog_yielded = True
+                yield "blog", blog
+            kind, parser = element_parsers[elem.tag]
+            yield kind, parser(elem)
+
+        elem.clear()
+        channel.remove(elem)
+
+    if not blog_yielded:
+        yield "blog", blog
+
+
+def wpparse(path, stream=False, records=False, projection=None):
+    """
+    Parse a WordPress export file.
+
+    With stream=True the file is read through wpiterparse, so the XML tree
+    is never held in memory as a whole. The result has the same shape, so
+    every parsed item is still collected in memory; only the tree overhead
+    is saved. Consume wpiterparse directly to process items one at a time.
+
+    With records=True items, comments and postmeta are returned as slotted
+    WPItem, WPComment and WPPostmeta objects instead of dicts. projection
+    limits what is extracted: a dict with optional "item", "comment" and
+    "postmeta" entries listing the field names (or meta keys) to keep, e.g.
+    {"item": ["title", "content", "post_type"], "comment": ["id"]}.
+    """
+
+    if stream:
+        return _collect_events(wpiterparse(path, records, projection))
+
     doc = ET.parse(path).getroot()
 
     channel = doc.find("./channel")
@@ -303,7 +579,7 @@ def wpparse(path):
     authors = _parse_authors(channel)
     categories = _parse_categories(channel)
     tags = _parse_tags(channel)
-    items = _parse_items(channel)
+    items = _parse_items(channel, records, projection)
 
     items_dict = {}
     for item in items:
@@ -318,4 +594,114 @@ def wpparse(path):
         "categories": categories,
         "tags": tags,
         "items": items_dict,
-    }
\ No newline at end of file
+    }
+
+
+def wpparse_many(paths, stream=False, records=False, projection=None, workers=None):
+    """
+    Parse several WordPress export files and merge them into one result.
+
+    Files are parsed concurrently in up to workers processes (None uses
+    every CPU, 1 parses them in this process). Authors, categories and
+    tags found in more than one file are kept once, keyed on login,
+    nicename and slug. Items are concatenated per post type in the order
+    of paths; an item exported by more than one file (same post_id) is
+    kept once and receives the comments of its duplicates that it does
+    not have yet. Comment threads, attachment parents and category
+    references are resolved on the merged result, so they may cross
+    file boundaries.
+    """
+
+    paths = list(paths)
+    parse = partial(wpparse, stream=stream, records=records, projection=projection)
+    if workers == 1 or len(paths) < 2:
+        results = [parse(path) for path in paths]
+    else:
+        max_workers = min(workers, len(paths)) if workers else None
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(parse, paths))
+    return _merge_results(results)
+
+
+def _merge_results(results):
+    """
+    Merge wpparse results, see wpparse_many.
+    """
+
+    blog = None
+    authors = {}
+    reference = {}
+    tags = {}
+    items_dict = {}
+    items_by_id = {}
+
+    for result in results:
+        if blog is None:
+            blog = result["blog"]
+        for author in result["authors"]:
+            authors.setdefault(author["login"], author)
+        stack = list(reversed(result["categories"]))
+        while stack:
+            category = stack.pop()
+            stack.extend(reversed(category.pop("children", [])))
+            reference.setdefault(category["nicename"], category)
+        for tag in result["tags"]:
+            tags.setdefault(tag["slug"], tag)
+
+        for post_type, items in result["items"].items():
+            merged = items_dict.setdefault(post_type, [])
+            for item in items:
+                post_id = item.get("post_id")
+                first = items_by_id.get(post_id) if post_id is not None else None
+                if first is None:
+                    if post_id is not None:
+                        items_by_id[post_id] = item
+                    merged.append(item)
+                    continue
+                comments = first.get("comments")
+                if comments is not None:
+                    known = {comment.get("id") for comment in comments}
+                    comments.extend(
+                        comment for comment in item.get("comments") or []
+                        if comment.get("id") not in known
+                    )
+
+    return {
+        "blog": blog,
+        "authors": list(authors.values()),
+        "categories": _build_category_tree(None, reference=reference),
+        "tags": list(tags.values()),
+        "items": items_dict,
+    }
+
+
+def _collect_events(events):
+    """
+    Build a wpparse result from the events yielded by wpiterparse.
+    """
+
+    blog = None
+    authors = []
+    reference = {}
+    tags = []
+    items_dict = {}
+
+    for kind, data in events:
+        if kind == "item":
+            items_dict.setdefault(data["post_type"], []).append(data)
+        elif kind == "author":
+            authors.append(data)
+        elif kind == "category":
+            reference[data["nicename"]] = data
+        elif kind == "tag":
+            tags.append(data)
+        elif kind == "blog":
+            blog = data
+
+    return {
+        "blog": blog,
+        "authors": authors,
+        "categories": _build_category_tree(None, reference=reference),
+        "tags": tags,
+        "items": items_dict,
+    }
@@ -0,0 +1,91 @@
+import cProfile
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class StageProfiler:
+    """
+    记录 convert_to_bson 各阶段的耗时、CPU 时间、峰值内存 (tracemalloc) 与处理条目数
+    report_path 不为空时在结束后写出 JSON 报告，cprofile_path 不为空时同时保存 cProfile 数据，
+    on_stage_start(name) / on_stage_end(name, record) 为可选的阶段回调
+    """
+
+    def __init__(
+        self,
+        report_path: str = None,
+        cprofile_path: str = None,
+        trace_memory: bool = True,
+        on_stage_start: callable = None,
+        on_stage_end: callable = None
+    ):
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        self.trace_memory = trace_memory
+        self.on_stage_start = on_stage_start
+        self.on_stage_end = on_stage_end
+        self.stages = []
+        self._profile = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.cprofile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile_path)
+            self._profile = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self.report_path:
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=4)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        记录一个阶段，可在 with 块内设置 record["items"] 为处理的条目数
+        """
+        record = {
+            "name": name,
+            "wall_time": None,
+            "cpu_time": None,
+            "peak_memory": None,
+            "items": None,
+        }
+        if self.on_stage_start:
+            self.on_stage_start(name)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - wall_start
+            record["cpu_time"] = time.process_time() - cpu_start
+            if tracing:
+                record["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(record)
+            logger.debug("Stage %s: %.3fs wall, %.3fs cpu, %s items", name, record["wall_time"], record["cpu_time"], record["items"])
+            if self.on_stage_end:
+                self.on_stage_end(name, record)
+
+    def report(self) -> dict:
+        return {
+            "stages": self.stages,
+            "total_wall_time": sum(stage["wall_time"] for stage in self.stages),
+            "total_cpu_time": sum(stage["cpu_time"] for stage in self.stages),
+            "peak_memory": max((stage["peak_memory"] or 0 for stage in self.stages), default=0),
+        }
@@ -0,0 +1,246 @@
+import os
+import pickle
+import sqlite3
+from bson import ObjectId
+
+SCHEMA = """
+CREATE TABLE items (
+    seq INTEGER PRIMARY KEY, post_type TEXT, post_id TEXT, data BLOB NOT NULL
+);
+CREATE INDEX items_post_type ON items (post_type, seq);
+CREATE INDEX items_post_id ON items (post_id);
+CREATE TABLE documents (
+    seq INTEGER PRIMARY KEY, collection TEXT NOT NULL, wp_type TEXT, wp_id TEXT, _id BLOB NOT NULL, data BLOB NOT NULL
+);
+CREATE INDEX documents_collection ON documents (collection, seq);
+CREATE INDEX documents_wp_id ON documents (wp_type, wp_id, seq);
+CREATE TABLE comments (
+    seq INTEGER PRIMARY KEY, _id BLOB NOT NULL, wp_id TEXT, parent_wp_id TEXT, ref BLOB, ref_type TEXT NOT NULL,
+    parent BLOB, level INTEGER, comment_index INTEGER NOT NULL DEFAULT 0, key TEXT NOT NULL DEFAULT '',
+    data BLOB NOT NULL
+);
+CREATE INDEX comments_id ON comments (_id);
+CREATE INDEX comments_wp_id ON comments (wp_id, seq);
+CREATE INDEX comments_parent ON comments (parent, seq);
+CREATE INDEX comments_ref ON comments (ref, level);
+CREATE INDEX comments_level ON comments (level);
+"""
+
+# 保持与 convert_to_bson 在内存中生成的集合顺序一致
+COLLECTIONS = ["categories", "comments", "posts", "pages", "notes"]
+
+class SpillStore:
+    """
+    convert_to_bson(spill_path=...) 使用的 SQLite 中间存储，解析出的条目、生成的文档与评论都写入磁盘，
+    评论的父子关系、key 与手记的 refType 通过带索引的 SQL 完成，内存占用与导出文件大小无关
+    每次打开时清空已有的文件
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def add_item(self, item, merge: bool = False):
+        """
+        保存解析出的条目；merge 为 True 时与已有的同 post_id 条目合并评论 (同 wpparse_many)
+        """
+        post_id = item.get("post_id")
+        if merge and post_id is not None:
+            row = self._conn.execute("SELECT seq, data FROM items WHERE post_id = ? ORDER BY seq LIMIT 1", (post_id,)).fetchone()
+            if row is not None:
+                first = pickle.loads(row[1])
+                comments = first.get("comments")
+                if comments is not None:
+                    known = {comment.get("id") for comment in comments}
+                    comments.extend(
+                        comment for comment in item.get("comments") or []
+                        if comment.get("id") not in known
+                    )
+                    self._conn.execute("UPDATE items SET data = ? WHERE seq = ?", (_dumps(first), row[0]))
+                return
+        self._conn.execute(
+            "INSERT INTO items (post_type, post_id, data) VALUES (?, ?, ?)",
+            (item["post_type"], post_id, _dumps(item))
+        )
+
+    def count_items(self, post_type: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM items WHERE post_type = ?", (post_type,)).fetchone()[0]
+
+    def count_documents(self, collection: str) -> int:
+        if collection == "comments":
+            return self._conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def iter_items(self, post_type: str, batch_size: int = 1000):
+        """
+        按导出顺序分批产出某种类型的条目列表
+        """
+        last = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT seq, data FROM items WHERE post_type = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (post_type, last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [pickle.loads(data) for _, data in rows]
+
+    def add_document(self, collection: str, document: dict, wp_type: str = None, wp_id: str = None):
+        self._conn.execute(
+            "INSERT INTO documents (collection, wp_type, wp_id, _id, data) VALUES (?, ?, ?, ?, ?)",
+            (collection, wp_type, wp_id, document["_id"].binary, _dumps(document))
+        )
+
+    def find_document_id(self, wp_type: str, wp_id: str) -> ObjectId:
+        """
+        按 WordPress 的 post_id 查找最先登记的文章 / 页面 / 手记的 _id
+        """
+        row = self._conn.execute(
+            "SELECT _id FROM documents WHERE wp_type = ? AND wp_id = ? ORDER BY seq LIMIT 1", (wp_type, wp_id)
+        ).fetchone()
+        return ObjectId(row[0]) if row else None
+
+    def add_comment(self, comment: dict):
+        """
+        保存 _create_comment 生成的评论，original 中的 id / parent_id 单独存为索引列
+        """
+        original = comment.pop("original")
+        self._conn.execute(
+            "INSERT INTO comments (_id, wp_id, parent_wp_id, ref, ref_type, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                comment["_id"].binary, original["id"], original["parent_id"],
+                comment["ref"].binary if comment["ref"] is not None else None, comment["refType"], _dumps(comment)
+            )
+        )
+
+    def link_comments(self) -> int:
+        """
+        按 WordPress 的父评论 id 找到父评论（同 id 时取最先出现的），返回有父评论的评论数
+        """
+        self._conn.execute(
+            "UPDATE comments SET parent = ("
+            "SELECT p._id FROM comments AS p WHERE p.wp_id = comments.parent_wp_id ORDER BY p.seq LIMIT 1"
+            ") WHERE parent_wp_id != '0'"
+        )
+        return self._conn.execute("SELECT COUNT(*) FROM comments WHERE parent IS NOT NULL").fetchone()[0]
+
+    def assign_comment_keys(self) -> int:
+        """
+        逐层分配评论的 commentIndex 与 key，与 _assign_comment_keys 的广度优先顺序一致，返回层数
+        """
+        self._conn.execute(
+            "UPDATE comments SET level = 0, comment_index = n.idx, key = '#' || n.idx FROM ("
+            "SELECT seq, ROW_NUMBER() OVER (PARTITION BY ref ORDER BY seq) AS idx "
+            "FROM comments WHERE parent IS NULL AND ref IS NOT NULL"
+            ") AS n WHERE comments.seq = n.seq"
+        )
+        level = 0
+        while True:
+            cursor = self._conn.execute(
+                "UPDATE comments SET level = :next, comment_index = n.idx, key = n.parent_key || '#' || n.idx FROM ("
+                "SELECT c.seq, p.key AS parent_key, ROW_NUMBER() OVER (PARTITION BY c.parent ORDER BY c.seq) AS idx "
+                "FROM comments AS c JOIN comments AS p ON p._id = c.parent "
+                "WHERE p.level = :level AND c.level IS NULL"
+                ") AS n WHERE comments.seq = n.seq",
+                {"level": level, "next": level + 1}
+            )
+            if cursor.rowcount <= 0:
+                return level + 1
+            level += 1
+
+    def mark_note_comments(self) -> int:
+        """
+        将引用手记的评论的 refType 改为 notes，返回修改的评论数
+        """
+        cursor = self._conn.execute(
+            "UPDATE comments SET ref_type = 'notes' "
+            "WHERE ref IN (SELECT _id FROM documents WHERE collection = 'notes')"
+        )
+        return cursor.rowcount
+
+    def migrations(self) -> dict:
+        """
+        返回 {集合名: SpilledCollection}，可以像 convert_to_bson 返回的列表一样遍历多次
+        """
+        self._conn.commit()
+        return {name: SpilledCollection(self.path, name) for name in COLLECTIONS}
+
+class SpilledCollection:
+    """
+    从 SpillStore 文件中按顺序逐个读取一个集合的文档，每次遍历使用独立的只读连接
+    """
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            if self.name == "comments":
+                return conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (self.name,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def __iter__(self):
+        conn = self._connect()
+        try:
+            if self.name == "comments":
+                yield from self._iter_comments(conn)
+            elif self.name in ("posts", "pages"):
+                rows = conn.execute(
+                    "SELECT d.data, (SELECT COUNT(*) FROM comments AS c WHERE c.ref = d._id AND c.level = 0) "
+                    "FROM documents AS d WHERE d.collection = ? ORDER BY d.seq", (self.name,)
+                )
+                for data, comments_index in rows:
+                    document = pickle.loads(data)
+                    document["commentsIndex"] = comments_index
+                    yield document
+            else:
+                rows = conn.execute("SELECT data FROM documents WHERE collection = ? ORDER BY seq", (self.name,))
+                for data, in rows:
+                    yield pickle.loads(data)
+        finally:
+            conn.close()
+
+    def _iter_comments(self, conn):
+        children_cursor = conn.cursor()
+        rows = conn.execute("SELECT _id, ref_type, parent, level, comment_index, key, data FROM comments ORDER BY seq")
+        for _id, ref_type, parent, level, comment_index, key, data in rows:
+            comment = pickle.loads(data)
+            children = [
+                ObjectId(child) for child, in
+                children_cursor.execute("SELECT _id FROM comments WHERE parent = ? ORDER BY seq", (_id,))
+            ]
+            comment["refType"] = ref_type
+            comment["children"] = children
+            comment["commentIndex"] = comment_index
+            comment["key"] = key
+            if parent is not None:
+                comment["parent"] = ObjectId(parent)
+            if level is not None and children:
+                comment["commentsIndex"] = len(children)
+            yield comment
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+def _dumps(value) -> bytes:
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,258 @@
+import os
+import json
+import bson
+import logging
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidBSON
+from .wpconvert import convert_keys_and_values
+
+logger = logging.getLogger(__name__)
+
+NoneType = type(None)
+
+# Mix Space 各集合的字段与允许的类型，与 convert_to_bson 生成的文档一致；
+# 缺少字段、类型不符或 NON_EMPTY_FIELDS 中的字段为空都视为错误
+SCHEMAS = {
+    "categories": {
+        "_id": ObjectId, "name": str, "type": int, "slug": str, "created": datetime,
+    },
+    "posts": {
+        "_id": ObjectId, "created": datetime, "commentsIndex": int, "allowComment": bool, "title": str,
+        "text": str, "images": list, "modified": (datetime, NoneType), "slug": str, "summary": (str, NoneType),
+        "categoryId": ObjectId, "copyright": bool, "tags": list, "count": dict, "pin": (datetime, NoneType),
+        "pinOrder": int, "related": list, "meta": (str, NoneType),
+    },
+    "pages": {
+        "_id": ObjectId, "created": datetime, "commentsIndex": int, "allowComment": bool, "title": str,
+        "text": str, "images": list, "modified": (datetime, NoneType), "slug": str, "subtitle": str, "order": int,
+    },
+    "notes": {
+        "_id": ObjectId, "created": datetime, "commentsIndex": int, "allowComment": bool, "title": str,
+        "text": str, "images": list, "modified": (datetime, NoneType), "hide": bool, "password": (str, NoneType),
+        "publicAt": (datetime, NoneType), "mood": str, "weather": str, "bookmark": bool,
+        "coordinates": (dict, NoneType), "location": str, "count": dict, "nid": int,
+    },
+    "comments": {
+        "_id": ObjectId, "ref": ObjectId, "refType": str, "author": str, "mail": (str, NoneType), "url": (str, NoneType),
+        "text": str, "state": int, "children": list, "commentIndex": int, "key": str, "ip": (str, NoneType),
+        "agent": str, "pin": bool, "isWhispers": bool, "created": datetime,
+    },
+}
+# 只有部分文档才有的字段
+OPTIONAL_FIELDS = {
+    "comments": {"parent": ObjectId, "commentsIndex": int},
+}
+NON_EMPTY_FIELDS = {
+    "categories": ("name", "slug"),
+    "posts": ("title", "slug"),
+    "pages": ("title", "slug"),
+    "notes": ("title",),
+    "comments": ("author", "text", "key"),
+}
+# 每个集合内不能重复的字段（_id 之外）
+UNIQUE_FIELDS = {
+    "categories": ("slug", "name"),
+    "posts": ("slug",),
+    "pages": ("slug",),
+    "notes": ("nid",),
+}
+# 评论可以引用的集合，按此顺序在评论之前校验
+REF_TYPES = ("posts", "pages", "notes")
+VERIFY_ORDER = ["categories", "posts", "pages", "notes", "comments"]
+
+def verify_bson(output_dir: str = "output", limit: int = 20) -> dict:
+    """
+    用 bson.decode_file_iter 逐个读取 output_dir 中的 {集合名}.bson 并校验，不在内存中保留文档：
+    字段与类型 (SCHEMAS)、_id 及 UNIQUE_FIELDS 的唯一性、文章的 categoryId、
+    评论的 ref / refType / parent / children 是否指向存在且一致的文档，以及评论 key 在同一引用下是否唯一
+    只保留 _id 等键的集合，每个文档占用的内存固定；评论的 parent / children 需要第二次读取 comments.bson
+    记录统计信息，并输出有问题的文档（最多 limit 个，其余只计数）
+    返回 {"collections": {集合名: {"documents", "invalid"}}, "problems": 问题数, "ok": 是否全部通过}
+    """
+    verifier = _Verifier(output_dir, limit)
+    for name in VERIFY_ORDER:
+        verifier.verify_collection(name)
+    verifier.verify_comment_tree()
+
+    for name, stats in verifier.stats.items():
+        logger.info("%s: %d documents, %d invalid", name, stats["documents"], stats["invalid"])
+    if verifier.problems:
+        logger.warning("Verification failed: %d problems in %d documents", verifier.problems, verifier.reported)
+    else:
+        logger.info("Verification passed")
+    return {"collections": verifier.stats, "problems": verifier.problems, "ok": not verifier.problems}
+
+class _Verifier:
+
+    def __init__(self, output_dir: str, limit: int):
+        self.output_dir = output_dir
+        self.limit = limit
+        self.stats = {}
+        self.problems = 0
+        self.reported = 0
+        # 已计为无效的 (集合名, _id)，第二次读取评论时不重复计数
+        self._invalid = set()
+        # {集合名: {_id 的 12 字节}}
+        self.ids = {}
+        # (父评论, 子评论) 的 _id 对，第二次读取评论时逐个核对
+        self.edges = set()
+
+    def verify_collection(self, name: str):
+        stats = self.stats[name] = {"documents": 0, "invalid": 0}
+        ids = self.ids[name] = set()
+        seen = {field: set() for field in UNIQUE_FIELDS.get(name, ())}
+        comment_keys = set()
+        for document in self._iter_documents(name):
+            stats["documents"] += 1
+            problems = _check_schema(name, document)
+            _id = document.get("_id")
+            if isinstance(_id, ObjectId):
+                if _id.binary in ids:
+                    problems.append(f"duplicate _id {_id}")
+                ids.add(_id.binary)
+            for field, values in seen.items():
+                value = document.get(field)
+                if not isinstance(value, (str, int)):
+                    continue
+                if value in values:
+                    problems.append(f"duplicate {field} {value!r}")
+                values.add(value)
+
+            if name == "posts":
+                problems.extend(self._check_category(document))
+            elif name == "comments":
+                problems.extend(self._check_comment_ref(document, comment_keys))
+                for child in document.get("children") or []:
+                    if isinstance(child, ObjectId) and isinstance(_id, ObjectId):
+                        self.edges.add((_id.binary, child.binary))
+            self._report(name, document, problems)
+
+    def verify_comment_tree(self):
+        """
+        第二次读取评论：parent 与 children 必须指向存在的评论，且父评论的 children 包含该评论
+        """
+        comment_ids = self.ids.get("comments")
+        if not os.path.exists(os.path.join(self.output_dir, "comments.bson")):
+            return
+        for document in self._iter_documents("comments"):
+            problems = []
+            _id = document.get("_id")
+            if not isinstance(_id, ObjectId):
+                continue
+            parent = document.get("parent")
+            if isinstance(parent, ObjectId):
+                if parent.binary not in comment_ids:
+                    problems.append(f"parent {parent} does not exist")
+                elif (parent.binary, _id.binary) not in self.edges:
+                    problems.append(f"parent {parent} does not list it in children")
+                self.edges.discard((parent.binary, _id.binary))
+            for child in document.get("children") or []:
+                if isinstance(child, ObjectId) and child.binary not in comment_ids:
+                    problems.append(f"child {child} does not exist")
+            self._report("comments", document, problems)
+        # 剩下的是子评论存在、但其 parent 不指向该评论的情况
+        for parent, child in sorted(self.edges):
+            if child in comment_ids:
+                self._report("comments", {"_id": ObjectId(parent)}, [f"child {ObjectId(child)} has a different parent"])
+        self.edges.clear()
+
+    def _check_category(self, document: dict) -> list:
+        category_id = document.get("categoryId")
+        if isinstance(category_id, ObjectId) and category_id.binary not in self.ids.get("categories", ()):
+            return [f"categoryId {category_id} does not exist"]
+        return []
+
+    def _check_comment_ref(self, document: dict, comment_keys: set) -> list:
+        problems = []
+        ref = document.get("ref")
+        ref_type = document.get("refType")
+        if ref_type not in REF_TYPES:
+            problems.append(f"unknown refType {ref_type!r}")
+        if isinstance(ref, ObjectId):
+            if not (ref_type in REF_TYPES and ref.binary in self.ids.get(ref_type, ())):
+                found = [_type for _type in REF_TYPES if ref.binary in self.ids.get(_type, ())]
+                if found:
+                    problems.append(f"ref {ref} is in {found[0]}, not {ref_type}")
+                else:
+                    problems.append(f"ref {ref} does not exist")
+            key = document.get("key")
+            if isinstance(key, str) and key:
+                if (ref.binary, key) in comment_keys:
+                    problems.append(f"duplicate key {key!r} under ref {ref}")
+                comment_keys.add((ref.binary, key))
+        return problems
+
+    def _iter_documents(self, name: str):
+        path = os.path.join(self.output_dir, f"{name}.bson")
+        if not os.path.exists(path):
+            self._report(name, None, [f"{path} does not exist"])
+            return
+        with open(path, "rb") as f:
+            try:
+                yield from bson.decode_file_iter(f)
+            except InvalidBSON as e:
+                self._report(name, None, [f"{path} is corrupt after offset {f.tell()}: {e}"])
+
+    def _report(self, name: str, document: dict, problems: list):
+        if not problems:
+            return
+        self.problems += len(problems)
+        if document is not None:
+            key = (name, str(document.get("_id")))
+            if key not in self._invalid:
+                self._invalid.add(key)
+                self.reported += 1
+                if name in self.stats:
+                    self.stats[name]["invalid"] += 1
+        if self.reported > self.limit:
+            return
+        if document is None:
+            for problem in problems:
+                logger.error("%s: %s", name, problem)
+            return
+        logger.warning(
+            "%s %s: %s\n%s", name, document.get("_id"), "; ".join(problems),
+            json.dumps(_shorten(convert_keys_and_values(document)), ensure_ascii=False, indent=4)
+        )
+
+def _check_schema(name: str, document: dict) -> list:
+    problems = []
+    schema = SCHEMAS[name]
+    for field, types in schema.items():
+        if field not in document:
+            problems.append(f"missing {field}")
+        elif not _is_instance(document[field], types):
+            problems.append(f"{field} is {type(document[field]).__name__}")
+    for field, types in OPTIONAL_FIELDS.get(name, {}).items():
+        if field in document and not _is_instance(document[field], types):
+            problems.append(f"{field} is {type(document[field]).__name__}")
+    for field in NON_EMPTY_FIELDS.get(name, ()):
+        if isinstance(document.get(field), str) and not document[field].strip():
+            problems.append(f"{field} is empty")
+    for field in document:
+        if field not in schema and field not in OPTIONAL_FIELDS.get(name, {}):
+            problems.append(f"unexpected field {field}")
+    if name == "comments":
+        children = document.get("children")
+        if isinstance(children, list) and not all(isinstance(child, ObjectId) for child in children):
+            problems.append("children contains a non-ObjectId")
+    return problems
+
+def _is_instance(value, types) -> bool:
+    # bool 是 int 的子类，int 字段不接受 bool
+    if isinstance(value, bool):
+        return types is bool or (isinstance(types, tuple) and bool in types)
+    return isinstance(value, types)
+
+def _shorten(value, length: int = 200):
+    """
+    输出问题文档时截断过长的字符串（例如正文）
+    """
+    if isinstance(value, dict):
+        return {key: _shorten(item, length) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shorten(item, length) for item in value]
+    if isinstance(value, str) and len(value) > length:
+        return value[:length] + f"... ({len(value)} chars)"
+    return value